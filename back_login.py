@@ -1,34 +1,28 @@
-import sqlite3
 import warnings
-import hashlib
 import streamlit as st
+import db_pool
+import passwords
+import migrations
+import rate_limit
+import metrics
+
+USER_DB = 'users.db'
 
 # Suppress DeprecationWarning
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
 # Function to connect to SQLite database
 def get_db_connection():
-    conn = sqlite3.connect('users.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+    # Pooled per-thread connection; do not close it
+    return db_pool.get_connection(USER_DB)
 
-# Function to create the user table if it doesn't exist
+# Function to bring the shared users table up to date (once per process)
 def create_table():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL UNIQUE,
-            password TEXT NOT NULL
-        )
-    ''')
-    conn.commit()
-    conn.close()
-
-# Function to hash the password using SHA256
+    migrations.ensure_user_schema(USER_DB)
+
+# Function to hash the password (salted scrypt on the shared hashing pool)
 def hash_password(password):
-    return hashlib.sha256(password.encode('utf-8')).hexdigest()
+    return passwords.hash_password(password)
 
 # Function to check if a user exists in the database
 def check_user_exists(username):
@@ -36,16 +30,12 @@ def check_user_exists(username):
     cursor = conn.cursor()
     cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
     user = cursor.fetchone()
-    conn.close()
     return user
 
 # Function to add a new user to the database
 def add_user(username, password):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('INSERT INTO users (username, password) VALUES (?, ?)', (username, password))
-    conn.commit()
-    conn.close()
+    with db_pool.transaction(USER_DB) as conn:
+        conn.execute('INSERT INTO users (username, password_hash, is_verified) VALUES (?, ?, 1)', (username, password))
 
 # Function to authenticate user during login
 def authenticate_user(username, password):
@@ -53,18 +43,22 @@ def authenticate_user(username, password):
     cursor = conn.cursor()
     cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
     user = cursor.fetchone()
-    conn.close()
-    if user and user['password'] == hash_password(password):
-        return True
-    return False
+    if not user:
+        return False
+    ok, upgrade = passwords.verify_password(password, user['password_hash'])
+    if upgrade:
+        # Rehash legacy SHA-256 (or outdated cost) passwords now that we know the plaintext.
+        # Hash before taking the write lock so other users.db writers aren't held up.
+        new_hash = hash_password(password)
+        with db_pool.transaction(USER_DB) as conn:
+            conn.execute('UPDATE users SET password_hash = ? WHERE id = ?', (new_hash, user['id']))
+    return ok
 
 # Function to update password for a user (reset password)
 def update_password(username, new_password):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('UPDATE users SET password = ? WHERE username = ?', (hash_password(new_password), username))
-    conn.commit()
-    conn.close()
+    new_hash = hash_password(new_password)
+    with db_pool.transaction(USER_DB) as conn:
+        conn.execute('UPDATE users SET password_hash = ? WHERE username = ?', (new_hash, username))
 
 # Main Streamlit app
 def main():
@@ -80,8 +74,12 @@ def main():
         password = st.text_input("Password", type='password')
 
         if st.button("Login"):
+            allowed, retry_after = rate_limit.allow("login", username)
             if not username or not password:
                 st.error("Please fill in both fields.")
+            elif not allowed:
+                # Rejected before the password hash is computed
+                st.error(rate_limit.retry_message(retry_after))
             else:
                 if authenticate_user(username, password):
                     st.success("Login successful!")
@@ -122,4 +120,6 @@ def main():
                 st.success("Password updated successfully! You can now login.")
 
 if __name__ == "__main__":
+    metrics.begin_rerun("back_login")
     main()
+    metrics.end_rerun()
@@ -1,111 +1,799 @@
-import sqlite3
-import os
+import re
 import difflib
+import db_pool
+import migrations
+import thumbnails
+import models
+import metrics
+from cache import TTLCache
+
+DB_PATH = "product.db"
+
+# Column weights for BM25 ranking: title, category, description
+SEARCH_WEIGHTS = (10.0, 5.0, 1.0)
+SEARCH_LIMIT = 100
+FEED_PAGE_SIZE = 12
+
+# Fuzzy "did you mean" tuning: candidates pulled from the trigram index, results kept
+SUGGESTION_CANDIDATES = 50
+SUGGESTION_LIMIT = 5
+SUGGESTION_CUTOFF = 0.4
+
+# Image renditions produced at ingest: kind -> (source column, max size)
+RENDITIONS = {
+    "grid": thumbnails.GRID_SIZE,
+    "detail": thumbnails.DETAIL_SIZE,
+}
+SELLER_RENDITION_SIZE = thumbnails.SELLER_SIZE   # stored once per seller, in seller_images
+
+# Prices are stored as integer minor units (paise, cents) next to the display string
+DEFAULT_CURRENCY = "INR"
+MINOR_UNITS_PER_MAJOR = 100
+CURRENCY_SYMBOLS = {"₹": "INR", "$": "USD", "€": "EUR", "£": "GBP"}
+CURRENCY_CODES = {"RS": "INR", "INR": "INR", "USD": "USD", "EUR": "EUR", "GBP": "GBP"}
+# A currency only counts right next to the amount, and codes only as whole tokens ("Rs. 500",
+# "15 USD"), so words like "pairs" or "hours" elsewhere in the text can't set it
+_CURRENCY = (
+    "[" + "".join(CURRENCY_SYMBOLS) + "]"
+    + "|(?<![A-Z])(?:" + "|".join(CURRENCY_CODES) + r")(?![A-Z])\.?"
+)
+GROUPED_AMOUNT = re.compile(r"\d{1,3}(?:,\d{2})*(?:,\d{3})+")   # 45,000 / 1,00,000 / 1,234,567
+PRICE_PATTERN = re.compile(
+    rf"(?:(?P<before>{_CURRENCY})\s*)?(?P<amount>\d(?:[\d,]*\d)?(?:\.\d+)?)(?:\s*(?P<after>{_CURRENCY}))?",
+    re.IGNORECASE,
+)
+# Rupee prices in order, then other currencies (not comparable with them), then unpriced listings
+PRICE_SORTS = {
+    direction: f"p.price_minor IS NULL, p.currency != '{DEFAULT_CURRENCY}', p.price_minor {direction.upper()}, p.id DESC"
+    for direction in ("asc", "desc")
+}
+
+# Flat listing shape used by bulk import/export and the sample data; seller_* live in the sellers table
+LISTING_FIELDS = (
+    "title", "price", "location", "category", "description", "image_url",
+    "seller_name", "seller_since", "seller_phone", "seller_email", "seller_photo",
+)
+
+# Product reads return models records: ProductCard for grids and search (no seller
+# details; batch-fetch them by seller_id), ProductDetail for the detail page
+CARD = models.ProductCard
+DETAIL = models.ProductDetail
+
+# Facets shown in the dashboard sidebar; price bands are (key, label, min, max) in major units
+FACETS = ("category", "location", "price")
+PRICE_BANDS = (
+    ("under-1k", "Under ₹1,000", None, 1000),
+    ("1k-5k", "₹1,000 – ₹5,000", 1000, 5000),
+    ("5k-20k", "₹5,000 – ₹20,000", 5000, 20000),
+    ("20k-50k", "₹20,000 – ₹50,000", 20000, 50000),
+    ("50k-plus", "₹50,000 and above", 50000, None),
+)
+
+# Read-through cache of product rows by id, shared by every session in the process.
+# Writes here invalidate it directly; the TTL bounds staleness from writes in other processes.
+PRODUCT_CACHE_SIZE = 1024
+PRODUCT_CACHE_TTL_SECONDS = 60
+_product_cache = TTLCache(max_size=PRODUCT_CACHE_SIZE, ttl=PRODUCT_CACHE_TTL_SECONDS)
+metrics.watch_cache("products", _product_cache)
+
+# The catalogue version is re-read at most this often; writes here reset it at once
+CATALOG_VERSION_TTL_SECONDS = 1.0
+_version_cache = TTLCache(max_size=16, ttl=CATALOG_VERSION_TTL_SECONDS)
 
 # ------------------ DB Connection ------------------
 
 def get_db_connection():
-    conn = sqlite3.connect("product.db")
-    conn.row_factory = sqlite3.Row
-    return conn
+    # Pooled per-thread connection; do not close it. The schema is migrated on
+    # first use (once per process), not when the module is imported.
+    create_product_table()
+    return db_pool.get_connection(DB_PATH)
+
+def transaction():
+    create_product_table()
+    return db_pool.transaction(DB_PATH)
 
 # ------------------ Create Table ------------------
 
 def create_product_table():
+    """Bring the product database schema up to date (runs the migrations once per process)."""
+    migrations.ensure_product_schema(DB_PATH)
+
+# ------------------ Catalogue Version ------------------
+
+@metrics.timed("db.catalog_version")
+def _load_catalog_version(path):
     conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS products (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            price TEXT,
-            location TEXT,
-            category TEXT,
-            description TEXT,
-            image_url TEXT,
-            seller_name TEXT,
-            seller_since TEXT,
-            seller_phone TEXT,
-            seller_email TEXT,
-            seller_photo TEXT
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    row = conn.execute("SELECT value FROM catalog_meta WHERE key = 'version'").fetchone()
+    return row[0] if row else 0
+
+def get_catalog_version():
+    """Counter bumped on every products change; a rerun with the same value can reuse what it has."""
+    return _version_cache.get_or_load(DB_PATH, _load_catalog_version)
+
+def invalidate_caches():
+    _version_cache.clear()
+
+# ------------------ Prices ------------------
+
+def parse_price(text):
+    """Parse a display price like "₹45,000" or "$12.50" into (minor_units, currency).
+
+    Returns (None, None) when no amount can be found, or when it uses a decimal
+    comma ("€1.234,50") that would otherwise be misread.
+    """
+    if not text:
+        return None, None
+    match = PRICE_PATTERN.search(str(text).strip())
+    if not match:
+        return None, None
+    amount = match.group("amount")
+    if "," in amount and not GROUPED_AMOUNT.fullmatch(amount.split(".")[0]):
+        return None, None   # "12,50": a decimal comma, not digit grouping
+    if re.match(r"[.,]\d", match.string[match.end("amount"):]):
+        return None, None   # "1.234,50" or "1.234.567": European separators would be misread
+    amount = float(amount.replace(",", ""))
+
+    # Symbols win over codes; a marker before the amount wins over one after it
+    tokens = [token for token in (match.group("before"), match.group("after")) if token]
+    symbols = [token for token in tokens if token in CURRENCY_SYMBOLS]
+    if symbols:
+        currency = CURRENCY_SYMBOLS[symbols[0]]
+    elif tokens:
+        currency = CURRENCY_CODES[tokens[0].rstrip(".").upper()]
+    else:
+        currency = DEFAULT_CURRENCY
+    return int(round(amount * MINOR_UNITS_PER_MAJOR)), currency
+
+def to_minor_units(amount):
+    return None if amount is None else int(round(amount * MINOR_UNITS_PER_MAJOR))
+
+# ------------------ Search Index ------------------
+
+def rebuild_search_index():
+    """Re-index every product from scratch (for existing or repaired product.db files)."""
+    with transaction() as conn:
+        cursor = conn.cursor()
+        migrations.create_search_index(cursor)
+        for table in migrations.SEARCH_INDEXES:
+            cursor.execute(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+            cursor.execute(f"INSERT INTO {table}({table}) VALUES ('optimize')")
+
+def build_match_query(keyword):
+    """Turn free text into an FTS5 query: every word must match as a prefix."""
+    words = re.findall(r"\w+", keyword.lower())
+    return " ".join(f'"{w}"*' for w in words)
+
+def build_trigram_query(keyword):
+    """OR together every trigram of the keyword so titles sharing the most rank first."""
+    text = " ".join(re.findall(r"\w+", keyword.lower()))
+    trigrams = {text[i:i + 3] for i in range(len(text) - 2)}
+    return " OR ".join(f'"{t}"' for t in sorted(trigrams) if " " not in t)
+
+# ------------------ Sellers ------------------
+
+SELLER_UPSERT_SQL = '''
+    INSERT INTO sellers (seller_key, name, member_since, phone, email, photo)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (seller_key) DO UPDATE SET
+        name = excluded.name, member_since = excluded.member_since, phone = excluded.phone,
+        email = excluded.email, photo = excluded.photo
+'''
+
+def seller_key(name, phone, email):
+    """Identity used to deduplicate sellers: their email, else name + phone. None if there's nothing to go on."""
+    email = (email or "").strip().lower()
+    if email:
+        return f"email:{email}"
+    name = (name or "").strip().lower()
+    phone = (phone or "").strip()
+    if name or phone:
+        return f"name:{name}|{phone}"
+    return None
+
+def upsert_seller(cursor, name, member_since, phone, email, photo):
+    """Insert or refresh a seller in the caller's transaction and return its id (None without details)."""
+    key = seller_key(name, phone, email)
+    if key is None:
+        return None
+    cursor.execute(SELLER_UPSERT_SQL + " RETURNING id", (key, name, member_since, phone, email, photo))
+    return cursor.fetchone()[0]
+
+@metrics.timed("db.get_sellers")
+def get_sellers(seller_ids):
+    """Return {seller_id: row} for the given ids in one query."""
+    seller_ids = {seller_id for seller_id in seller_ids if seller_id is not None}
+    if not seller_ids:
+        return {}
+    conn = get_db_connection()
+    placeholders = ",".join("?" * len(seller_ids))
+    rows = conn.execute(f"SELECT * FROM sellers WHERE id IN ({placeholders})", tuple(seller_ids)).fetchall()
+    return {row["id"]: row for row in rows}
+
+@metrics.timed("db.update_seller")
+def update_seller(seller_id, **fields):
+    """Change a seller's name/member_since/phone/email/photo once for all of their listings."""
+    columns = {"name", "member_since", "phone", "email", "photo"}
+    unknown = set(fields) - columns
+    if unknown:
+        raise ValueError(f"Unknown seller fields: {', '.join(sorted(unknown))}")
+    if not fields:
+        return
+    assignments = ", ".join(f"{column} = ?" for column in fields)
+    with transaction() as conn:
+        conn.execute(f"UPDATE sellers SET {assignments} WHERE id = ?", (*fields.values(), seller_id))
+        # Cards show seller details, so their listings count as changed
+        conn.execute("UPDATE products SET version = version + 1 WHERE seller_id = ?", (seller_id,))
+    invalidate_caches()
+    invalidate_sellers({seller_id})
+
+    if fields.get("photo"):
+        # One avatar row for the seller; the product images stay as they are
+        ingest_renditions([], [(seller_id, fields["photo"])])
 
 # ------------------ Add Product ------------------
 
+def insert_listings(cursor, listings):
+    """Insert flat listing tuples (LISTING_FIELDS order) in the caller's transaction.
+
+    Sellers are upserted with one executemany and linked by key, so a batch of
+    any size costs two statements.
+    """
+    sellers = []
+    products = []
+    for title, price, location, category, description, image_url, name, since, phone, email, photo in listings:
+        key = seller_key(name, phone, email)
+        if key is not None:
+            sellers.append((key, name, since, phone, email, photo))
+        price_minor, currency = parse_price(price)
+        products.append((title, price, price_minor, currency, location, category, description, image_url, key))
+
+    cursor.executemany(SELLER_UPSERT_SQL, sellers)
+    cursor.executemany('''
+        INSERT INTO products (
+            title, price, price_minor, currency, location, category, description, image_url, seller_id
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, (SELECT id FROM sellers WHERE seller_key = ?))
+    ''', products)
+    return len(products)
+
+@metrics.timed("db.add_product")
 def add_product(product):
+    price_minor, currency = parse_price(product['price'])
+    seller = product['seller']
+    with transaction() as conn:
+        cursor = conn.cursor()
+        seller_id = upsert_seller(cursor, seller['name'], seller['member_since'], seller['phone'],
+                                  seller['email'], seller['photo'])
+        cursor.execute('''
+            INSERT INTO products (
+                title, price, price_minor, currency, location, category, description, image_url, seller_id
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            product['title'],
+            product['price'],
+            price_minor,
+            currency,
+            product['location'],
+            product['category'],
+            product['description'],
+            product['image'],
+            seller_id,
+        ))
+        product_id = cursor.lastrowid
+    invalidate_caches()
+    # The seller upsert may have changed details shown on that seller's other cached listings
+    if seller_id is not None:
+        invalidate_sellers({seller_id})
+
+    # Image work happens after the insert commits so the write lock isn't held over the network
+    ingest_renditions([(product_id, product['image'])], [(seller_id, product['seller']['photo'])])
+    return product_id
+
+# ------------------ Product Lookups ------------------
+
+@metrics.timed("db.load_product")
+def _load_product(product_id):
     conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO products (
-            title, price, location, category, description, image_url,
-            seller_name, seller_since, seller_phone, seller_email, seller_photo
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        product['title'],
-        product['price'],
-        product['location'],
-        product['category'],
-        product['description'],
-        product['image'],
-        product['seller']['name'],
-        product['seller']['member_since'],
-        product['seller']['phone'],
-        product['seller']['email'],
-        product['seller']['photo']
-    ))
-    conn.commit()
-    conn.close()
+    return models.fetch_one(conn, DETAIL, f"SELECT {DETAIL.SELECT} FROM {DETAIL.FROM} WHERE p.id = ?", (product_id,))
+
+def get_product(product_id):
+    """Return one product row with its seller_* details (or None), served from the in-process cache when possible."""
+    return _product_cache.get_or_load(int(product_id), _load_product)
+
+def invalidate_product(product_id):
+    _product_cache.invalidate(int(product_id))
+
+def invalidate_sellers(seller_ids):
+    """Drop the cached listings of these sellers, whose details just changed."""
+    seller_ids = set(seller_ids)
+    if seller_ids:
+        _product_cache.invalidate_where(lambda row: row["seller_id"] in seller_ids)
+
+def invalidate_listing_sellers(listings):
+    """invalidate_sellers() for the sellers flat listings upserted; call after their insert commits."""
+    if not len(_product_cache):
+        return
+    keys = list({seller_key(name, phone, email)
+                 for _, _, _, _, _, _, name, _, phone, email, _ in listings} - {None})
+    conn = get_db_connection()
+    seller_ids = set()
+    for start in range(0, len(keys), 500):
+        chunk = keys[start:start + 500]
+        rows = conn.execute(
+            f"SELECT id FROM sellers WHERE seller_key IN ({','.join('?' * len(chunk))})", chunk
+        ).fetchall()
+        seller_ids.update(row[0] for row in rows)
+    invalidate_sellers(seller_ids)
+
+def product_cache_stats():
+    """Size and hit/miss counters of the product cache."""
+    return _product_cache.stats()
+
+# ------------------ Image Renditions ------------------
+
+@metrics.timed("db.ingest_renditions")
+def ingest_renditions(products, sellers=()):
+    """Produce and store every rendition for (product_id, image_url) and (seller_id, photo_url) tuples.
+
+    Downloads and resizes run concurrently through the thumbnail service; the
+    pages only ever read the stored bytes back. A seller whose stored avatar
+    already comes from photo_url is skipped.
+    """
+    wanted = []
+    for product_id, image_url in products:
+        if image_url:
+            wanted.extend((product_id, kind, image_url, size) for kind, size in RENDITIONS.items())
+
+    sellers = {seller_id: url for seller_id, url in sellers if seller_id is not None and url}
+    if sellers:
+        conn = get_db_connection()
+        placeholders = ",".join("?" * len(sellers))
+        current = dict(conn.execute(
+            f"SELECT seller_id, source_url FROM seller_images WHERE seller_id IN ({placeholders})",
+            tuple(sellers),
+        ).fetchall())
+        sellers = {seller_id: url for seller_id, url in sellers.items() if current.get(seller_id) != url}
+
+    images = thumbnails.get_thumbnails(
+        [(url, size) for _, _, url, size in wanted] + [(url, SELLER_RENDITION_SIZE) for url in sellers.values()]
+    )
+    rows = []
+    for product_id, kind, url, size in wanted:
+        data = images.get((url, size))
+        if data:
+            rows.append((product_id, kind, url, size[0], size[1], data))
+    seller_rows = []
+    for seller_id, url in sellers.items():
+        data = images.get((url, SELLER_RENDITION_SIZE))
+        if data:
+            seller_rows.append((seller_id, url, *SELLER_RENDITION_SIZE, data))
+
+    if rows or seller_rows:
+        with transaction() as conn:
+            conn.executemany('''
+                INSERT OR REPLACE INTO product_images (product_id, kind, source_url, width, height, data)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', rows)
+            conn.executemany('''
+                INSERT OR REPLACE INTO seller_images (seller_id, source_url, width, height, data)
+                VALUES (?, ?, ?, ?, ?)
+            ''', seller_rows)
+    return len(rows) + len(seller_rows)
+
+def backfill_renditions(batch_size=50):
+    """Generate renditions for products and sellers that don't have them yet. Returns how many were stored."""
+    conn = get_db_connection()
+    stored = 0
+    last_id = 0
+    while True:
+        batch = conn.execute('''
+            SELECT p.id, p.image_url FROM products p
+            WHERE p.id > ? AND NOT EXISTS (
+                SELECT 1 FROM product_images i WHERE i.product_id = p.id AND i.kind = 'grid'
+            )
+            ORDER BY p.id
+            LIMIT ?
+        ''', (last_id, batch_size)).fetchall()
+        if not batch:
+            break
+        last_id = batch[-1]["id"]
+        stored += ingest_renditions([tuple(row) for row in batch])
+
+    # Sellers without an avatar, or whose photo changed since it was stored
+    last_id = 0
+    while True:
+        batch = conn.execute('''
+            SELECT s.id, s.photo FROM sellers s
+            LEFT JOIN seller_images i ON i.seller_id = s.id
+            WHERE s.id > ? AND s.photo IS NOT NULL AND s.photo != ''
+              AND (i.source_url IS NULL OR i.source_url != s.photo)
+            ORDER BY s.id
+            LIMIT ?
+        ''', (last_id, batch_size)).fetchall()
+        if not batch:
+            return stored
+        last_id = batch[-1]["id"]
+        stored += ingest_renditions([], [tuple(row) for row in batch])
+
+@metrics.timed("db.get_renditions")
+def get_renditions(product_ids, kind):
+    """Return {product_id: jpeg bytes} for the given rendition kind."""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return {}
+    conn = get_db_connection()
+    placeholders = ",".join("?" * len(product_ids))
+    rows = conn.execute(
+        f"SELECT product_id, data FROM product_images WHERE kind = ? AND product_id IN ({placeholders})",
+        (kind, *product_ids),
+    ).fetchall()
+    return {row["product_id"]: row["data"] for row in rows}
+
+@metrics.timed("db.get_rendition")
+def get_rendition(product_id, kind):
+    return get_renditions([product_id], kind).get(product_id)
+
+@metrics.timed("db.get_seller_rendition")
+def get_seller_rendition(seller_id):
+    """The seller's stored avatar (jpeg bytes), or None."""
+    if seller_id is None:
+        return None
+    conn = get_db_connection()
+    row = conn.execute("SELECT data FROM seller_images WHERE seller_id = ?", (seller_id,)).fetchone()
+    return row["data"] if row else None
 
 # ------------------ Search Product ------------------
 
-def search_products(keyword):
+@metrics.timed("db.search_products")
+def search_products(keyword, limit=SEARCH_LIMIT):
     conn = get_db_connection()
     cursor = conn.cursor()
-    keyword_like = f"%{keyword.lower()}%"
-    cursor.execute('''
-        SELECT * FROM products 
-        WHERE LOWER(title) LIKE ? OR LOWER(category) LIKE ? OR LOWER(description) LIKE ?
-    ''', (keyword_like, keyword_like, keyword_like))
-    results = cursor.fetchall()
+    cursor.row_factory = CARD.from_cursor
+    results = []
+    match_query = build_match_query(keyword)
+    if match_query:
+        cursor.execute(f'''
+            SELECT {CARD.SELECT} FROM products_fts
+            JOIN products p ON p.id = products_fts.rowid
+            WHERE products_fts MATCH ?
+            ORDER BY bm25(products_fts, ?, ?, ?)
+            LIMIT ?
+        ''', (match_query, *SEARCH_WEIGHTS, limit))
+        results = cursor.fetchall()
 
     # Suggest similar titles if exact match fails
     if not results:
-        cursor.execute("SELECT title FROM products")
-        titles = [row["title"] for row in cursor.fetchall()]
-        suggestions = difflib.get_close_matches(keyword, titles, n=5, cutoff=0.4)
-
-        if suggestions:
-            suggestion_like = [f"%{s.lower()}%" for s in suggestions]
-            results = []
-            for s in suggestion_like:
-                cursor.execute('''
-                    SELECT * FROM products WHERE LOWER(title) LIKE ?
-                ''', (s,))
-                results.extend(cursor.fetchall())
-
-    conn.close()
+        results = suggest_products(cursor, keyword)
+
     return results
 
+def suggest_products(cursor, keyword, limit=SUGGESTION_LIMIT):
+    """Return products whose titles are close to keyword, best match first.
+
+    The trigram index narrows the catalogue to a handful of candidates in one
+    query; only those are re-scored with difflib.
+    """
+    trigram_query = build_trigram_query(keyword)
+    if not trigram_query:
+        return []
+
+    cursor.row_factory = CARD.from_cursor
+    cursor.execute(f'''
+        SELECT {CARD.SELECT} FROM products_trigram
+        JOIN products p ON p.id = products_trigram.rowid
+        WHERE products_trigram MATCH ?
+        ORDER BY bm25(products_trigram)
+        LIMIT ?
+    ''', (trigram_query, SUGGESTION_CANDIDATES))
+
+    needle = keyword.lower()
+    scored = []
+    for row in cursor.fetchall():
+        score = difflib.SequenceMatcher(None, needle, row["title"].lower()).ratio()
+        if score >= SUGGESTION_CUTOFF:
+            scored.append((score, row))
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return [row for _, row in scored[:limit]]
+
 # ------------------ Get All Products ------------------
 
-def get_all_products():
+@metrics.timed("db.get_all_products")
+def get_all_products(projection="card"):
+    """Every product as records of the given projection ("card", "detail" or "facet")."""
+    projection = models.get_projection(projection)
     conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM products")
-    rows = cursor.fetchall()
-    conn.close()
+    return models.fetch_all(conn, projection, f"SELECT {projection.SELECT} FROM {projection.FROM}")
+
+# ------------------ Paginated Listing ------------------
+
+@metrics.timed("db.has_products")
+def has_products():
+    """Cheap emptiness check that stops at the first row."""
+    conn = get_db_connection()
+    return bool(conn.execute("SELECT EXISTS(SELECT 1 FROM products)").fetchone()[0])
+
+@metrics.timed("db.get_products_page")
+def get_products_page(before_id=None, limit=FEED_PAGE_SIZE):
+    """Return (rows, next_cursor) for the newest products older than before_id.
+
+    Keyset pagination on the primary key: each page is an index range scan no
+    matter how deep the user scrolls. next_cursor is None on the last page.
+    """
+    conn = get_db_connection()
+    if before_id is None:
+        rows = models.fetch_all(conn, CARD, f"SELECT {CARD.SELECT} FROM products p ORDER BY p.id DESC LIMIT ?",
+                                (limit + 1,))
+    else:
+        rows = models.fetch_all(
+            conn, CARD, f"SELECT {CARD.SELECT} FROM products p WHERE p.id < ? ORDER BY p.id DESC LIMIT ?",
+            (before_id, limit + 1),
+        )
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1]["id"]
+    return rows, None
+
+@metrics.timed("db.get_products_down_to")
+def get_products_down_to(last_id=None):
+    """Every product from the newest down to last_id inclusive (all of them when None), newest first.
+
+    Refreshes a feed that has paged down to last_id without moving its cursor.
+    """
+    conn = get_db_connection()
+    if last_id is None:
+        return models.fetch_all(conn, CARD, f"SELECT {CARD.SELECT} FROM products p ORDER BY p.id DESC")
+    return models.fetch_all(
+        conn, CARD, f"SELECT {CARD.SELECT} FROM products p WHERE p.id >= ? ORDER BY p.id DESC", (last_id,)
+    )
+
+# ------------------ Filtered Queries ------------------
+
+@metrics.timed("db.query_products")
+def query_products(keyword=None, category=None, min_price=None, max_price=None, sort=None, limit=None,
+                   location=None, price_band=None):
+    """One query for the dashboard: optional full-text keyword, category, location and price filters.
+
+    With a keyword, results come from the FTS index ranked by BM25 (or by
+    price when sort is "asc"/"desc") and fall back to fuzzy suggestions on a
+    miss; without one, newest first unless sorted by price.
+    """
+    filters = facet_filters(category, location, price_band)
+    clauses, params = price_range_clause(min_price, max_price)
+    for clause, clause_params in filters.values():
+        clauses.append(clause)
+        params.extend(clause_params)
+
+    match_query = build_match_query(keyword) if keyword else ""
+    if keyword and match_query:
+        sql = f"SELECT {CARD.SELECT} FROM products_fts JOIN products p ON p.id = products_fts.rowid"
+        clauses.insert(0, "products_fts MATCH ?")
+        params.insert(0, match_query)
+        order_by = PRICE_SORTS.get(sort) or "bm25(products_fts, {}, {}, {})".format(*SEARCH_WEIGHTS)
+        limit = limit or SEARCH_LIMIT
+    else:
+        sql = f"SELECT {CARD.SELECT} FROM products p"
+        order_by = PRICE_SORTS.get(sort, "p.id DESC")
+
+    if keyword and not match_query:
+        rows = []
+    else:
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += f" ORDER BY {order_by}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        conn = get_db_connection()
+        rows = models.fetch_all(conn, CARD, sql, params)
+
+    if keyword and not rows:
+        conn = get_db_connection()
+        rows = [
+            row for row in suggest_products(conn.cursor(), keyword)
+            if (not category or row["category"] == category)
+            and (not location or row["location"] == location)
+            and (not price_band or price_band_of(row["price_minor"], row["currency"]) == price_band)
+            and price_matches(row["price_minor"], row["currency"], min_price, max_price)
+        ]
     return rows
 
+def price_matches(price_minor, currency, min_price=None, max_price=None):
+    """Python twin of price_range_clause for rows that didn't come through SQL filters."""
+    if min_price is None and max_price is None:
+        return True
+    if price_minor is None or currency != DEFAULT_CURRENCY:
+        return False
+    if min_price is not None and price_minor < to_minor_units(min_price):
+        return False
+    if max_price is not None and price_minor > to_minor_units(max_price):
+        return False
+    return True
+
+def get_products_in_category(category, limit=None):
+    return query_products(category=category, limit=limit)
+
+def price_range_clause(min_price=None, max_price=None):
+    """SQL conditions and parameters restricting listings to a range in major DEFAULT_CURRENCY units.
+
+    Listings priced in other currencies can't be compared, so any bound excludes them.
+    """
+    if min_price is None and max_price is None:
+        return [], []
+    clauses, params = ["p.currency = ?"], [DEFAULT_CURRENCY]
+    if min_price is not None:
+        clauses.append("p.price_minor >= ?")
+        params.append(to_minor_units(min_price))
+    if max_price is not None:
+        clauses.append("p.price_minor <= ?")
+        params.append(to_minor_units(max_price))
+    return clauses, params
+
+# ------------------ Faceted Search ------------------
+
+def price_band_expression():
+    """SQL CASE mapping p.price_minor to a PRICE_BANDS key (NULL for unpriced or non-rupee rows)."""
+    whens = []
+    for key, _, low, high in PRICE_BANDS:
+        conditions = ["p.price_minor IS NOT NULL", f"p.currency = '{DEFAULT_CURRENCY}'"]
+        if low is not None:
+            conditions.append(f"p.price_minor >= {to_minor_units(low)}")
+        if high is not None:
+            conditions.append(f"p.price_minor < {to_minor_units(high)}")
+        whens.append(f"WHEN {' AND '.join(conditions)} THEN '{key}'")
+    return "CASE " + " ".join(whens) + " END"
+
+def price_band_of(price_minor, currency):
+    if price_minor is None or currency != DEFAULT_CURRENCY:
+        return None
+    for key, _, low, high in PRICE_BANDS:
+        if (low is None or price_minor >= to_minor_units(low)) and (high is None or price_minor < to_minor_units(high)):
+            return key
+    return None
+
+def price_band_clause(price_band):
+    for key, _, low, high in PRICE_BANDS:
+        if key == price_band:
+            clauses = ["p.currency = ?", "p.price_minor IS NOT NULL"]
+            params = [DEFAULT_CURRENCY]
+            if low is not None:
+                clauses.append("p.price_minor >= ?")
+                params.append(to_minor_units(low))
+            if high is not None:
+                clauses.append("p.price_minor < ?")
+                params.append(to_minor_units(high))
+            return " AND ".join(clauses), params
+    raise ValueError(f"Unknown price band: {price_band}")
+
+def facet_filters(category=None, location=None, price_band=None):
+    """{facet: (sql clause, params)} for every facet the shopper has drilled into."""
+    filters = {}
+    if category:
+        filters["category"] = ("p.category = ?", [category])
+    if location:
+        filters["location"] = ("p.location = ?", [location])
+    if price_band:
+        filters["price"] = price_band_clause(price_band)
+    return filters
+
+@metrics.timed("db.faceted_search")
+def faceted_search(keyword=None, category=None, location=None, price_band=None,
+                   min_price=None, max_price=None, sort=None, limit=None):
+    """Return (rows, facets) for the current drill-down.
+
+    facets maps "category", "location" and "price" to [(value, count), ...].
+    Each facet is counted with every other active filter applied but not its
+    own, so shoppers can see what switching a value would give them. Rows and
+    all three facet counts are read from one snapshot; the counts come from a
+    single UNION ALL statement over the indexed columns.
+    """
+    filters = facet_filters(category, location, price_band)
+    common, common_params = price_range_clause(min_price, max_price)
+
+    create_product_table()
+    with db_pool.snapshot(DB_PATH) as conn:
+        rows = query_products(keyword, category, min_price, max_price, sort, limit,
+                              location=location, price_band=price_band)
+
+        match_query = build_match_query(keyword) if keyword else ""
+        if keyword and not match_query:
+            return rows, empty_facets()
+
+        params = []
+        if match_query:
+            # Evaluate the full-text match once and count facets over the matching rows
+            prefix = f'''
+                WITH base AS MATERIALIZED (
+                    SELECT {models.ProductFacet.SELECT}
+                    FROM products_fts JOIN products p ON p.id = products_fts.rowid
+                    WHERE products_fts MATCH ?
+                )
+            '''
+            params.append(match_query)
+            source = "base p"
+        else:
+            prefix = ""
+            source = "products p"
+
+        arms = []
+        for facet, value_sql in (("category", "p.category"),
+                                 ("location", "p.location"),
+                                 ("price", price_band_expression())):
+            clauses = list(common)
+            arm_params = list(common_params)
+            for other, (clause, clause_params) in filters.items():
+                if other != facet:
+                    clauses.append(clause)
+                    arm_params.extend(clause_params)
+            where = " WHERE " + " AND ".join(clauses) if clauses else ""
+            arms.append(f"SELECT '{facet}', {value_sql} AS value, COUNT(*) FROM {source}{where} GROUP BY value")
+            params.extend(arm_params)
+
+        counts = conn.execute(prefix + " UNION ALL ".join(arms), params).fetchall()
+
+    if keyword and not match_query_hits(counts):
+        # The keyword missed and rows are fuzzy suggestions: count those instead
+        return rows, facets_from_rows(rows)
+    return rows, facets_from_counts(counts)
+
+def empty_facets():
+    return {facet: [] for facet in FACETS}
+
+def match_query_hits(counts):
+    return any(count for _, _, count in counts)
+
+def facets_from_counts(counts):
+    facets = empty_facets()
+    for facet, value, count in counts:
+        if value not in (None, ""):
+            facets[facet].append((value, count))
+    return sort_facets(facets)
+
+def facets_from_rows(rows):
+    counts = {}
+    for row in rows:
+        for facet, value in (("category", row["category"]),
+                             ("location", row["location"]),
+                             ("price", price_band_of(row["price_minor"], row["currency"]))):
+            counts[(facet, value)] = counts.get((facet, value), 0) + 1
+    return facets_from_counts([(facet, value, count) for (facet, value), count in counts.items()])
+
+def sort_facets(facets):
+    band_order = {key: i for i, (key, _, _, _) in enumerate(PRICE_BANDS)}
+    facets["category"].sort()
+    facets["location"].sort()
+    facets["price"].sort(key=lambda item: band_order[item[0]])
+    return facets
+
+def price_band_label(price_band):
+    for key, label, _, _ in PRICE_BANDS:
+        if key == price_band:
+            return label
+    return price_band
+
 # ------------------ Delete Product ------------------
 
+@metrics.timed("db.delete_product")
 def delete_product(product_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM products WHERE id = ?', (product_id,))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute('DELETE FROM product_images WHERE product_id = ?', (product_id,))
+        conn.execute('DELETE FROM products WHERE id = ?', (product_id,))
+    invalidate_caches()
+    invalidate_product(product_id)
+
+# ------------------ CLI ------------------
+
+if __name__ == "__main__":
+    import argparse
 
+    parser = argparse.ArgumentParser(description="EcoFinds product database tools")
+    parser.add_argument("command", choices=["rebuild-search-index", "backfill-renditions"])
+    parser.add_argument("--db", default=DB_PATH, help="path to product.db")
+    args = parser.parse_args()
 
+    DB_PATH = args.db
+    if args.command == "rebuild-search-index":
+        create_product_table()
+        rebuild_search_index()
+        print(f"Search index rebuilt for {DB_PATH}")
+    elif args.command == "backfill-renditions":
+        create_product_table()
+        print(f"Stored {backfill_renditions()} image renditions in {DB_PATH}")
@@ -0,0 +1,202 @@
+"""Benchmark the search, listing and auth hot paths on synthetic data.
+
+For each size, builds a throwaway catalogue and user base of that many rows
+in a temp directory, then times each case for about --seconds and reports
+throughput and latency percentiles. Results are saved as JSON so runs can be
+compared over time (--compare prints the p50 change against an earlier file):
+
+    python benchmarks/bench_hot_paths.py
+    python benchmarks/bench_hot_paths.py --sizes 1000,100000,1000000 --seconds 3
+    python benchmarks/bench_hot_paths.py --compare benchmarks/results/hot_paths-20260101-120000.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import backend_db as bd
+import back_login
+import bulk_io
+import db_pool
+import migrations
+import passwords
+import user_db
+from bench_row_memory import CATEGORIES, synthetic_listings
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+PASSWORD = "correct horse battery staple"
+SEARCH_HITS = ("charger", "mobiles", "warranty bill", "bicycles pickup", "original box")
+FUZZY_MISSES = ("chargr", "mobils", "warrenty", "bycicles", "furnitur")
+MIN_ITERATIONS = 20
+
+# ------------------ Data ------------------
+
+def build_catalogue(path, rows, sellers):
+    """Load rows synthetic listings with the search triggers off, then index once (like bulk_io --defer-index)."""
+    bd.DB_PATH = path
+    bd.create_product_table()
+    bulk_io.drop_search_triggers()
+    listings = synthetic_listings(rows, sellers)
+    try:
+        while True:
+            chunk = [listing for _, listing in zip(range(bulk_io.BATCH_SIZE), listings)]
+            if not chunk:
+                break
+            with db_pool.transaction(path) as conn:
+                bd.insert_listings(conn.cursor(), chunk)
+    finally:
+        bd.rebuild_search_index()
+    # Product ids restart in every catalogue, so cached rows from the last size must go
+    bd._product_cache.clear()
+    bd.invalidate_caches()
+
+def build_users(path, rows):
+    """rows verified users sharing one real password hash, reachable by email (front) and username (back_login)."""
+    user_db.DB_PATH = back_login.USER_DB = path
+    migrations.ensure_user_schema(path)
+    stored = passwords.hash_password(PASSWORD)
+    now = int(time.time())
+    batch = []
+    for i in range(rows):
+        batch.append((f"user{i}@example.com", f"User {i}", stored, f"user{i}", now))
+        if len(batch) == bulk_io.BATCH_SIZE or i == rows - 1:
+            with db_pool.transaction(path) as conn:
+                conn.executemany('''
+                    INSERT INTO users (email, name, password_hash, username, is_verified, created_at)
+                    VALUES (?, ?, ?, ?, 1, ?)
+                ''', batch)
+            batch = []
+
+# ------------------ Cases ------------------
+
+def cases(size, rng):
+    """(name, callable) pairs; each callable does one operation."""
+    registered = iter(range(10 ** 9))
+
+    def register():
+        # front.py's registration: existence check, hash, insert
+        email = f"new{next(registered)}-{rng.random()}@example.com"
+        if not user_db.user_exists(email):
+            user_db.create_user(email, "New User", passwords.hash_password(PASSWORD), verified=True)
+
+    def login_front():
+        user = user_db.get_user(f"user{rng.randrange(size)}@example.com")
+        passwords.verify_password(PASSWORD, user["password_hash"])
+
+    def feed_page():
+        # home.homepage's data loading: first feed page plus its grid renditions
+        page, _ = bd.get_products_page()
+        bd.get_renditions((product["id"] for product in page), "grid")
+
+    return [
+        ("search_hit", lambda: bd.search_products(rng.choice(SEARCH_HITS))),
+        ("search_fuzzy_miss", lambda: bd.search_products(rng.choice(FUZZY_MISSES))),
+        ("category_filter", lambda: bd.get_products_in_category(rng.choice(CATEGORIES), limit=bd.SEARCH_LIMIT)),
+        ("detail_lookup", lambda: bd.get_product(rng.randint(1, size))),
+        ("feed_page", feed_page),
+        ("all_products_card", lambda: bd.get_all_products("card")),
+        ("register", register),
+        ("login_front", login_front),
+        ("login_back_login", lambda: back_login.authenticate_user(f"user{rng.randrange(size)}", PASSWORD)),
+    ]
+
+def run_case(func, seconds):
+    """Call func for about `seconds` (at least MIN_ITERATIONS times) and summarise the latencies."""
+    func()   # warm up statement caches and lazy imports
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline or len(latencies) < MIN_ITERATIONS:
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    def pct(q):
+        return 1000 * latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    return {
+        "iterations": len(latencies),
+        "ops_per_second": len(latencies) / sum(latencies),
+        "mean_ms": 1000 * statistics.fmean(latencies),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+    }
+
+# ------------------ Reporting ------------------
+
+def environment():
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "password_scheme": passwords.SCHEME,
+    }
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["size"], r["case"]): r for r in json.load(f)["results"]}
+    print(f"\nagainst {os.path.basename(baseline_path)} (p50)")
+    for result in results:
+        before = baseline.get((result["size"], result["case"]))
+        if before:
+            change = (result["p50_ms"] - before["p50_ms"]) / before["p50_ms"] * 100 if before["p50_ms"] else 0.0
+            print(f"{result['size']:>10,} {result['case']:<20}{before['p50_ms']:>10.3f} -> "
+                  f"{result['p50_ms']:>10.3f} ms ({change:+.0f}%)")
+
+def run_sizes(sizes, args, rng, tmp, results):
+    for size in sizes:
+        start = time.perf_counter()
+        build_catalogue(os.path.join(tmp, f"products-{size}.db"), size, min(args.sellers, size))
+        build_users(os.path.join(tmp, f"users-{size}.db"), size)
+        print(f"\n{size:,} listings and users built in {time.perf_counter() - start:.1f}s")
+        print(f"{'case':<20}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for name, func in cases(size, rng):
+            stats = run_case(func, args.seconds)
+            results.append({"size": size, "case": name, **stats})
+            print(f"{name:<20}{stats['ops_per_second']:>10,.0f}{stats['p50_ms']:>10.3f}"
+                  f"{stats['p95_ms']:>10.3f}{stats['p99_ms']:>10.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,100000", help="comma-separated listing/user counts")
+    parser.add_argument("--sellers", type=int, default=5_000, help="distinct sellers in each catalogue")
+    parser.add_argument("--seconds", type=float, default=1.0, help="time spent on each case")
+    parser.add_argument("--output", help="JSON results file (default: benchmarks/results/hot_paths-<time>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    output = os.path.abspath(
+        args.output or os.path.join(RESULTS_DIR, f"hot_paths-{time.strftime('%Y%m%d-%H%M%S')}.json"))
+    baseline = os.path.abspath(args.compare) if args.compare else None
+    rng = random.Random(7)
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        # Nothing relative (users.json, .thumb_cache) should resolve into the repo
+        os.chdir(tmp)
+        try:
+            run_sizes(sizes, args, rng, tmp, results)
+        finally:
+            db_pool.close_all()
+            os.chdir(cwd)
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment(), "args": vars(args), "results": results}, f, indent=2)
+    print(f"\nresults written to {output}")
+    if baseline:
+        compare(results, baseline)
+
+if __name__ == "__main__":
+    main()
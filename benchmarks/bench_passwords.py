@@ -0,0 +1,66 @@
+"""Measure password hashing throughput at different cost settings.
+
+Reports how many logins per second one process can verify at each cost,
+both one at a time and with the hashing pool saturated, so the cost can be
+sized against peak login traffic:
+
+    python benchmarks/bench_passwords.py
+    python benchmarks/bench_passwords.py --seconds 5 --concurrency 8
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import passwords
+
+SETTINGS = (
+    ("scrypt", {"scrypt_n": 2 ** 12}),
+    ("scrypt", {"scrypt_n": 2 ** 13}),
+    ("scrypt", {"scrypt_n": 2 ** 14}),
+    ("scrypt", {"scrypt_n": 2 ** 15}),
+    ("pbkdf2_sha256", {"pbkdf2_iterations": 100_000}),
+    ("pbkdf2_sha256", {"pbkdf2_iterations": 300_000}),
+    ("pbkdf2_sha256", {"pbkdf2_iterations": 600_000}),
+)
+
+def logins_per_second(stored, seconds, concurrency):
+    """Run verify_password against stored for about `seconds` and return (rate, mean latency ms)."""
+    deadline = time.perf_counter() + seconds
+    latencies = []
+
+    def worker():
+        done = []
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            passwords.verify_password("correct horse battery staple", stored)
+            done.append(time.perf_counter() - start)
+        return done
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for result in pool.map(lambda _: worker(), range(concurrency)):
+            latencies.extend(result)
+    elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, 1000 * sum(latencies) / max(len(latencies), 1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=2.0, help="time spent on each measurement")
+    parser.add_argument("--concurrency", type=int, default=passwords.HASH_WORKERS,
+                        help="simultaneous logins for the saturated measurement")
+    args = parser.parse_args()
+
+    print(f"hash pool workers: {passwords.HASH_WORKERS}, CPUs: {os.cpu_count()}")
+    print(f"{'scheme':<15}{'cost':>10}{'serial/s':>12}{'serial ms':>12}{'pooled/s':>12}{'pooled ms':>12}")
+    for scheme, cost in SETTINGS:
+        stored = passwords.hash_password("correct horse battery staple", scheme=scheme, **cost)
+        serial_rate, serial_ms = logins_per_second(stored, args.seconds, 1)
+        pooled_rate, pooled_ms = logins_per_second(stored, args.seconds, args.concurrency)
+        print(f"{scheme:<15}{list(cost.values())[0]:>10}{serial_rate:>12.1f}{serial_ms:>12.1f}"
+              f"{pooled_rate:>12.1f}{pooled_ms:>12.1f}")
+
+if __name__ == "__main__":
+    main()
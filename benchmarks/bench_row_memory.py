@@ -0,0 +1,107 @@
+"""Measure the memory footprint of product rows per projection.
+
+Builds a throwaway catalogue of synthetic listings, then loads it whole
+with the old `SELECT *` + sqlite3.Row shape and with each models projection,
+reporting bytes per row (tracemalloc, values included) and load time
+(measured with tracing on, so compare the columns rather than the absolutes):
+
+    python benchmarks/bench_row_memory.py
+    python benchmarks/bench_row_memory.py --rows 1000000
+"""
+import argparse
+import gc
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import backend_db as bd
+import db_pool
+import models
+
+CATEGORIES = ("Mobiles", "Bicycles", "Furniture", "Books", "Electronics", "Fashion")
+CITIES = ("Mumbai", "Delhi", "Bengaluru", "Pune", "Chennai", "Hyderabad", "Kolkata")
+WORDS = ("excellent", "condition", "barely", "used", "with", "box", "charger", "scratches",
+         "original", "bill", "warranty", "pickup", "only", "negotiable", "urgent", "sale")
+
+def synthetic_listings(count, sellers, seed=7):
+    rng = random.Random(seed)
+    for i in range(count):
+        seller = rng.randrange(sellers)
+        yield (
+            f"{rng.choice(WORDS).title()} {rng.choice(CATEGORIES)} item {i}",
+            f"₹{rng.randint(100, 90000):,}",
+            rng.choice(CITIES),
+            rng.choice(CATEGORIES),
+            " ".join(rng.choice(WORDS) for _ in range(30)),
+            f"https://images.example.com/listings/{i}/cover-photo-large.jpg",
+            f"Seller {seller}",
+            str(rng.randint(2015, 2025)),
+            f"+91-9{seller:09d}",
+            f"seller{seller}@example.com",
+            f"https://images.example.com/sellers/{seller}/avatar.jpg",
+        )
+
+def build_catalogue(path, rows, sellers, batch=10000):
+    bd.DB_PATH = path
+    bd.create_product_table()
+    listings = synthetic_listings(rows, sellers)
+    while True:
+        chunk = [listing for _, listing in zip(range(batch), listings)]
+        if not chunk:
+            break
+        with db_pool.transaction(path) as conn:
+            bd.insert_listings(conn.cursor(), chunk)
+
+def measure(load):
+    """Return (bytes held by the loaded rows, rows, seconds to load)."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = load()
+    elapsed = time.perf_counter() - start
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    count = len(rows)
+    del rows
+    return held, count, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000, help="listings in the synthetic catalogue")
+    parser.add_argument("--sellers", type=int, default=5_000, help="distinct sellers behind them")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench_products.db")
+        print(f"building {args.rows:,} listings from {args.sellers:,} sellers ...")
+        build_catalogue(path, args.rows, args.sellers)
+
+        # The pre-models shape: every column, sellers included, as sqlite3.Row
+        legacy = sqlite3.connect(path)
+        legacy.row_factory = sqlite3.Row
+        wide_sql = f"SELECT p.*, s.name, s.member_since, s.phone, s.email, s.photo FROM {models.ProductDetail.FROM}"
+        conn = db_pool.get_connection(path)
+
+        cases = [
+            ("SELECT * + sqlite3.Row", lambda: legacy.execute(wide_sql).fetchall()),
+            ("card cols + sqlite3.Row",
+             lambda: legacy.execute(f"SELECT {models.ProductCard.SELECT} FROM products p").fetchall()),
+        ]
+        for name, projection in models.PROJECTIONS.items():
+            sql = f"SELECT {projection.SELECT} FROM {projection.FROM}"
+            cases.append((f"{name} projection", lambda p=projection, s=sql: models.fetch_all(conn, p, s)))
+
+        print(f"{'shape':<26}{'bytes/row':>12}{'total MB':>12}{'load s':>10}")
+        for label, load in cases:
+            held, count, elapsed = measure(load)
+            print(f"{label:<26}{held / count:>12,.0f}{held / 2 ** 20:>12.1f}{elapsed:>10.2f}")
+        legacy.close()
+        db_pool.close_all()
+
+if __name__ == "__main__":
+    main()
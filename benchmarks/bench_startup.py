@@ -0,0 +1,83 @@
+"""Measure cold-start cost: module import time and time to first render.
+
+Every sample runs in a fresh interpreter so nothing is already imported.
+Imports are timed against the repo; the entry points are rendered with
+Streamlit's AppTest inside a throwaway copy of the repo (databases included),
+so first-use migrations never touch the real product.db/users.db:
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ("streamlit", "emailverification", "user_db", "sessions", "backend_db", "home", "dashbaordn")
+ENTRY_POINTS = ("front.py", "integrated.py", "back_login.py")
+
+IMPORT_SNIPPET = """
+import sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+# AppTest itself (and streamlit) is imported before the clock starts; the first
+# run() pays for the script's own imports and first-use setup, the second is a warm rerun
+RENDER_SNIPPET = """
+import sys, time
+sys.path.insert(0, {root!r})
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({script!r}, default_timeout=120)
+start = time.perf_counter()
+at.run()
+first = time.perf_counter() - start
+start = time.perf_counter()
+at.run()
+print(first, time.perf_counter() - start, len(at.exception))
+"""
+
+def run_snippet(code, cwd):
+    """Run code in a fresh interpreter and return the numbers on its last output line."""
+    out = subprocess.run([sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True, check=True)
+    return [float(value) for value in out.stdout.strip().splitlines()[-1].split()]
+
+def copy_repo(dest):
+    shutil.copytree(ROOT, dest, ignore=shutil.ignore_patterns(".git", "__pycache__", ".thumb_cache", "benchmarks"))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per measurement (best is reported)")
+    args = parser.parse_args()
+
+    print(f"{'import':<22}{'best ms':>10}{'median ms':>11}")
+    for module in MODULES:
+        samples = [run_snippet(IMPORT_SNIPPET.format(root=ROOT, module=module), ROOT)[0] for _ in range(args.runs)]
+        print(f"{module:<22}{min(samples) * 1000:>10.0f}{statistics.median(samples) * 1000:>11.0f}")
+
+    print(f"\n{'first render':<22}{'best ms':>10}{'median ms':>11}{'rerun ms':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for script in ENTRY_POINTS:
+            firsts, reruns = [], []
+            for run in range(args.runs):
+                # A fresh copy each time, so every sample includes first-use migrations
+                workdir = os.path.join(tmp, f"{script}-{run}")
+                copy_repo(workdir)
+                code = RENDER_SNIPPET.format(root=workdir, script=os.path.join(workdir, script))
+                first, rerun, errors = run_snippet(code, workdir)
+                if errors:
+                    print(f"  {script} raised during render", file=sys.stderr)
+                firsts.append(first)
+                reruns.append(rerun)
+            print(f"{script:<22}{min(firsts) * 1000:>10.0f}{statistics.median(firsts) * 1000:>11.0f}"
+                  f"{statistics.median(reruns) * 1000:>10.0f}")
+
+if __name__ == "__main__":
+    main()
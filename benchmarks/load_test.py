@@ -0,0 +1,399 @@
+"""Load-test the marketplace pages with many concurrent simulated sessions.
+
+Runs home.homepage, home.product_detail and dashbaordn.show_dashboard, plus
+listing writes and OTP sends. The pages run directly against a stubbed `st`
+module from --workers threads in each of --processes processes. A thread
+is one Streamlit script runner; a process is one server. Everything shares
+one synthetic product.db in a temp directory. Images come from a local
+stand-in image host and emails go to a fake Brevo provider, so the test
+runs offline. Reports throughput, tail latency and SQLite lock errors per
+scenario:
+
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --processes 4 --workers 16 --seconds 30 --mix home=40,dashboard=40,write=20
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import types
+from collections import Counter
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import backend_db as bd
+import db_pool
+from bench_row_memory import CATEGORIES, CITIES, WORDS, build_catalogue
+
+DEFAULT_MIX = "home=45,detail=20,dashboard=25,write=5,otp=5"
+IMAGE_LATENCY_SECONDS = 0.05
+BREVO_LATENCY_SECONDS = 0.2
+SESSION_RERUNS = 10     # reruns per simulated browser session before a fresh one starts
+
+# ------------------ Stubbed Streamlit ------------------
+
+class RerunRequested(Exception):
+    pass
+
+class StopRequested(Exception):
+    pass
+
+class SessionState(dict):
+    """st.session_state stand-in: a dict with attribute access."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+    def __delattr__(self, name):
+        del self[name]
+
+class Element:
+    """Any element or container: accepts every call and renders nothing."""
+
+    def __call__(self, *args, **kwargs):
+        return self
+
+    def __getattr__(self, name):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+class StubStreamlit(types.ModuleType):
+    """Installed as sys.modules["streamlit"] before the pages are imported.
+
+    Session state and text inputs are per thread, like one script run per
+    browser session; widgets return their defaults (or the keyed session value).
+    """
+
+    def __init__(self):
+        super().__init__("streamlit")
+        self._local = threading.local()
+        self.sidebar = Element()
+
+    def __getattr__(self, name):
+        return Element()
+
+    @property
+    def session_state(self):
+        return self._local.session_state
+
+    def new_session(self, inputs=None):
+        self._local.session_state = SessionState()
+        self._local.inputs = inputs or {}
+
+    def text_input(self, label, value="", **kwargs):
+        return self._local.inputs.get(label, value)
+
+    def number_input(self, label, min_value=None, max_value=None, value=0, **kwargs):
+        return value
+
+    def selectbox(self, label, options, index=0, key=None, **kwargs):
+        options = list(options)
+        choice = self.session_state.get(key, options[index]) if key else options[index]
+        if key:
+            self.session_state[key] = choice
+        return choice
+
+    def button(self, *args, **kwargs):
+        return False
+
+    def columns(self, spec, **kwargs):
+        return [Element() for _ in range(spec if isinstance(spec, int) else len(spec))]
+
+    def cache_data(self, func=None, **kwargs):
+        return func if func is not None else (lambda f: f)
+
+    cache_resource = cache_data
+    fragment = cache_data   # fragments run inline; there is no partial rerun to simulate
+
+    def rerun(self, *args, **kwargs):
+        raise RerunRequested()
+
+    def stop(self):
+        raise StopRequested()
+
+# ------------------ Local stand-ins ------------------
+
+def fake_image_session(latency):
+    """A requests session whose every GET answers with one JPEG after `latency` seconds."""
+    import requests
+    from PIL import Image
+
+    buf = BytesIO()
+    Image.new("RGB", (640, 480), (90, 140, 90)).save(buf, format="JPEG")
+    jpeg = buf.getvalue()
+
+    class FakeImageHost(requests.adapters.BaseAdapter):
+        fetches = 0
+        lock = threading.Lock()
+
+        def send(self, request, **kwargs):
+            time.sleep(latency)
+            with FakeImageHost.lock:
+                FakeImageHost.fetches += 1
+            resp = requests.Response()
+            resp.status_code = 200
+            resp._content = jpeg
+            resp.headers["Content-Type"] = "image/jpeg"
+            resp.url = request.url
+            resp.request = request
+            return resp
+
+        def close(self):
+            pass
+
+    session = requests.Session()
+    session.mount("http://", FakeImageHost())
+    session.mount("https://", FakeImageHost())
+    return session, FakeImageHost
+
+class FakeBrevo:
+    """Outbox provider that accepts every message after a Brevo-like round trip."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.sent = 0
+        self.lock = threading.Lock()
+
+    def send_batch(self, messages):
+        time.sleep(self.latency)
+        with self.lock:
+            self.sent += len(messages)
+        return {message["id"]: None for message in messages}
+
+def ingest_newest(count, workdir):
+    """Store renditions for the newest listings (the home feed) through the fake image host."""
+    import thumbnails
+
+    session, _ = fake_image_session(0)
+    thumbnails.configure(cache_dir=os.path.join(workdir, "thumbs-setup"), session=session)
+    rows = bd.get_db_connection().execute('''
+        SELECT p.id, p.image_url, p.seller_id, s.photo FROM products p LEFT JOIN sellers s ON s.id = p.seller_id
+        ORDER BY p.id DESC LIMIT ?
+    ''', (count,)).fetchall()
+    bd.ingest_renditions([(row["id"], row["image_url"]) for row in rows],
+                         [(row["seller_id"], row["photo"]) for row in rows])
+
+# ------------------ Scenarios ------------------
+
+def scenario_home(pages, rng, ctx):
+    pages["home"].homepage()
+
+def scenario_detail(pages, rng, ctx):
+    pages["st"].session_state.selected_id = rng.randint(1, ctx["max_id"])
+    pages["home"].product_detail()
+
+def scenario_dashboard(pages, rng, ctx):
+    state = pages["st"].session_state
+    state.facet_category = rng.choice(("All",) + CATEGORIES)
+    state.facet_location = rng.choice(("All", "All") + CITIES)
+    pages["st"]._local.inputs["Search by name"] = rng.choice(("", "", "charger", "barely used", "chargr"))
+    pages["dashboard"].show_dashboard()
+
+def scenario_write(pages, rng, ctx):
+    n = rng.randrange(10 ** 9)
+    bd.add_product({
+        "title": f"Load test {rng.choice(WORDS)} {n}",
+        "price": f"₹{rng.randint(100, 90000):,}",
+        "location": rng.choice(CITIES),
+        "category": rng.choice(CATEGORIES),
+        "description": " ".join(rng.choice(WORDS) for _ in range(20)),
+        "image": f"https://images.example.com/load/{n}.jpg",
+        "seller": {"name": f"Seller {n % 500}", "member_since": "2024", "phone": f"+91-8{n % 500:09d}",
+                   "email": f"seller{n % 500}@example.com",
+                   "photo": f"https://images.example.com/sellers/{n % 500}/avatar.jpg"},
+    })
+
+def scenario_otp(pages, rng, ctx):
+    import emailverification
+    import otp_store
+
+    email = f"load{rng.randrange(10 ** 6)}@example.com"
+    emailverification.queue_email_otp(email, otp_store.issue(email, "register"))
+
+SCENARIOS = {
+    "home": scenario_home,
+    "detail": scenario_detail,
+    "dashboard": scenario_dashboard,
+    "write": scenario_write,
+    "otp": scenario_otp,
+}
+
+def is_lock_error(error):
+    return isinstance(error, sqlite3.OperationalError) and ("locked" in str(error) or "busy" in str(error))
+
+def merge_stats(into, stats):
+    for name, s in stats.items():
+        m = into.setdefault(name, {"latencies": [], "errors": Counter(), "lock_errors": 0})
+        m["latencies"].extend(s["latencies"])
+        m["errors"].update(s["errors"])
+        m["lock_errors"] += s["lock_errors"]
+
+def session_worker(pages, mix, deadline, seed, ctx):
+    """One simulated script runner: reruns random scenarios until deadline. Returns its stats."""
+    rng = random.Random(seed)
+    names, weights = zip(*mix.items())
+    stats = {name: {"latencies": [], "errors": Counter(), "lock_errors": 0} for name in names}
+    reruns = 0
+    while time.perf_counter() < deadline:
+        if reruns % SESSION_RERUNS == 0:
+            pages["st"].new_session()
+        reruns += 1
+        name = rng.choices(names, weights)[0]
+        start = time.perf_counter()
+        try:
+            SCENARIOS[name](pages, rng, ctx)
+        except (RerunRequested, StopRequested):
+            pass
+        except Exception as e:
+            if is_lock_error(e):
+                stats[name]["lock_errors"] += 1
+            else:
+                stats[name]["errors"][type(e).__name__] += 1
+        stats[name]["latencies"].append(time.perf_counter() - start)
+    return stats
+
+# ------------------ Processes ------------------
+
+def run_process(config):
+    """Entry point of one simulated server process (spawned, so nothing is inherited)."""
+    os.chdir(config["workdir"])
+    stub = StubStreamlit()
+    sys.modules["streamlit"] = stub
+
+    import dashbaordn
+    import home
+    import outbox
+    import thumbnails
+
+    session, image_host = fake_image_session(config["image_latency"])
+    thumbnails.configure(cache_dir=os.path.join(config["workdir"], f"thumbs-{os.getpid()}"), session=session)
+    brevo = FakeBrevo(config["brevo_latency"])
+    outbox.set_provider(brevo)
+
+    pages = {"st": stub, "home": home, "dashboard": dashbaordn}
+    ctx = {"max_id": config["max_id"]}
+    deadline = time.perf_counter() + config["seconds"]
+    results = [None] * config["workers"]
+
+    def run(i):
+        results[i] = session_worker(pages, config["mix"], deadline, config["seed"] * 1000 + i, ctx)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(config["workers"])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Let queued OTP emails drain so the Brevo count reflects the run
+    time.sleep(min(2.0, config["brevo_latency"] * 4))
+
+    merged = {}
+    for stats in results:
+        merge_stats(merged, stats)
+    return {"scenarios": merged, "image_fetches": image_host.fetches, "emails_sent": brevo.sent}
+
+# ------------------ Reporting ------------------
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise SystemExit(f"unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))] if sorted_values else 0.0
+
+def summarise(process_results, seconds):
+    scenarios = {}
+    for result in process_results:
+        merge_stats(scenarios, result["scenarios"])
+
+    summary = {"scenarios": {}, "seconds": seconds}
+    for name, s in sorted(scenarios.items()):
+        latencies = sorted(s["latencies"])
+        summary["scenarios"][name] = {
+            "ops": len(latencies),
+            "ops_per_second": len(latencies) / seconds,
+            "p50_ms": 1000 * percentile(latencies, 0.50),
+            "p95_ms": 1000 * percentile(latencies, 0.95),
+            "p99_ms": 1000 * percentile(latencies, 0.99),
+            "max_ms": 1000 * (latencies[-1] if latencies else 0.0),
+            "lock_errors": s["lock_errors"],
+            "errors": dict(s["errors"]),
+        }
+    summary["ops_per_second"] = sum(s["ops_per_second"] for s in summary["scenarios"].values())
+    summary["lock_errors"] = sum(s["lock_errors"] for s in summary["scenarios"].values())
+    summary["image_fetches"] = sum(result["image_fetches"] for result in process_results)
+    summary["emails_sent"] = sum(result["emails_sent"] for result in process_results)
+    return summary
+
+def print_summary(summary):
+    print(f"{'scenario':<12}{'ops':>8}{'ops/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+          f"{'locked':>8}  errors")
+    for name, s in summary["scenarios"].items():
+        errors = ", ".join(f"{kind} x{count}" for kind, count in s["errors"].items()) or "-"
+        print(f"{name:<12}{s['ops']:>8,}{s['ops_per_second']:>9,.1f}{s['p50_ms']:>9.1f}{s['p95_ms']:>9.1f}"
+              f"{s['p99_ms']:>9.1f}{s['max_ms']:>9.1f}{s['lock_errors']:>8}  {errors}")
+    print(f"\ntotal {summary['ops_per_second']:,.1f} reruns/s, {summary['lock_errors']} SQLite lock errors, "
+          f"{summary['image_fetches']} image fetches, {summary['emails_sent']} emails delivered")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=2, help="simulated server processes")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent sessions per process")
+    parser.add_argument("--seconds", type=float, default=10.0, help="length of the run")
+    parser.add_argument("--rows", type=int, default=5_000, help="listings in the synthetic catalogue")
+    parser.add_argument("--renditions", type=int, default=120,
+                        help="newest listings given stored images up front, as ingest would have")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="scenario weights, e.g. home=50,write=50")
+    parser.add_argument("--image-latency", type=float, default=IMAGE_LATENCY_SECONDS,
+                        help="seconds the fake image host takes per fetch")
+    parser.add_argument("--brevo-latency", type=float, default=BREVO_LATENCY_SECONDS,
+                        help="seconds the fake Brevo API takes per batch")
+    parser.add_argument("--output", help="also write the summary as JSON")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"building {args.rows:,} listings ...")
+        build_catalogue(os.path.join(tmp, "product.db"), args.rows, max(1, args.rows // 20))
+        ingest_newest(args.renditions, tmp)
+        max_id = db_pool.get_connection(bd.DB_PATH).execute("SELECT MAX(id) FROM products").fetchone()[0]
+        db_pool.close_all()
+
+        print(f"{args.processes} processes x {args.workers} sessions for {args.seconds:g}s, mix {args.mix}\n")
+        configs = [
+            {"workdir": tmp, "workers": args.workers, "seconds": args.seconds, "mix": mix, "seed": i,
+             "max_id": max_id, "image_latency": args.image_latency, "brevo_latency": args.brevo_latency}
+            for i in range(args.processes)
+        ]
+        with multiprocessing.get_context("spawn").Pool(args.processes) as pool:
+            process_results = pool.map(run_process, configs)
+
+    summary = summarise(process_results, args.seconds)
+    print_summary(summary)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import csv
+import json
+import os
+import sys
+import time
+import db_pool
+import migrations
+import backend_db as bd
+
+# Flat listing columns, in import/export order
+FIELDS = bd.LISTING_FIELDS
+
+# add_product-style nested records ({"image": ..., "seller": {...}}) map onto the flat columns
+SELLER_FIELDS = {"name": "seller_name", "member_since": "seller_since", "phone": "seller_phone",
+                 "email": "seller_email", "photo": "seller_photo"}
+
+BATCH_SIZE = 5000          # rows per transaction
+EXPORT_FETCH_SIZE = 1000   # rows pulled from the cursor at a time
+MAX_REPORTED_ERRORS = 20
+MAX_TITLE_LENGTH = 200
+
+# Sellers are joined back in so exported files round-trip through the importer
+EXPORT_SQL = '''
+    SELECT p.title, p.price, p.location, p.category, p.description, p.image_url,
+           s.name, s.member_since, s.phone, s.email, s.photo
+    FROM products p LEFT JOIN sellers s ON s.id = p.seller_id
+    ORDER BY p.id
+'''
+
+# ------------------ Reading ------------------
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+
+def read_records(path, fmt=None):
+    """Yield (line_number, record dict) from a CSV or JSON Lines file, one at a time."""
+    fmt = detect_format(path, fmt)
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+        else:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError as e:
+                    yield line_number, ValueError(f"invalid JSON: {e}")
+
+def flatten(record):
+    """Accept both flat rows and add_product-style nested records."""
+    flat = dict(record)
+    if "image" in flat and "image_url" not in flat:
+        flat["image_url"] = flat.pop("image")
+    seller = flat.pop("seller", None)
+    if isinstance(seller, dict):
+        for key, column in SELLER_FIELDS.items():
+            flat.setdefault(column, seller.get(key))
+    return flat
+
+def validate(record):
+    """Return (LISTING_FIELDS tuple, None) or (None, error message)."""
+    if isinstance(record, Exception):
+        return None, str(record)
+    if not isinstance(record, dict):
+        return None, "record is not an object"
+
+    flat = flatten(record)
+    values = {}
+    for field in FIELDS:
+        value = flat.get(field)
+        values[field] = str(value).strip() if value not in (None, "") else None
+
+    if not values["title"]:
+        return None, "missing title"
+    if len(values["title"]) > MAX_TITLE_LENGTH:
+        return None, f"title longer than {MAX_TITLE_LENGTH} characters"
+
+    if values["price"] and bd.parse_price(values["price"])[0] is None:
+        return None, f"unparseable price {values['price']!r}"
+    return tuple(values[field] for field in FIELDS), None
+
+# ------------------ Import ------------------
+
+def print_progress(stats):
+    print(f"  {stats['imported']:,} imported, {stats['rejected']:,} rejected "
+          f"({stats['rows_per_second']:,.0f} rows/s)", file=sys.stderr)
+
+def _insert_batch(rows):
+    with db_pool.transaction(bd.DB_PATH) as conn:
+        bd.insert_listings(conn.cursor(), rows)
+    # Seller upserts change the details shown on those sellers' cached listings
+    bd.invalidate_listing_sellers(rows)
+
+def drop_search_triggers():
+    """Stop per-row search indexing; rebuild_search_index() puts the triggers back."""
+    with db_pool.transaction(bd.DB_PATH) as conn:
+        names = [
+            row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+            if row[0].startswith(migrations.SEARCH_INDEXES)
+        ]
+        for name in names:
+            conn.execute(f"DROP TRIGGER {name}")
+
+def import_products(path, fmt=None, batch_size=BATCH_SIZE, progress=print_progress, defer_index=False):
+    """Stream listings from a CSV/JSONL file into products in batch_size transactions.
+
+    Invalid rows are skipped and reported. Returns a stats dict with imported,
+    rejected, errors [(line, message), ...], seconds and rows_per_second.
+
+    defer_index drops the search triggers for the import and rebuilds both
+    indexes once at the end, several times faster for big catalogues; new
+    rows aren't searchable until it finishes. If the process dies mid-import,
+    `python backend_db.py rebuild-search-index` restores the triggers.
+    Images are not fetched here; run `python backend_db.py backfill-renditions` afterwards.
+    """
+    bd.create_product_table()
+    if defer_index:
+        drop_search_triggers()
+    stats = {"imported": 0, "rejected": 0, "errors": [], "seconds": 0.0, "rows_per_second": 0.0}
+    started = time.perf_counter()
+
+    def report():
+        stats["seconds"] = time.perf_counter() - started
+        stats["rows_per_second"] = stats["imported"] / stats["seconds"] if stats["seconds"] else 0.0
+        if progress:
+            progress(stats)
+
+    batch = []
+    try:
+        for line_number, record in read_records(path, fmt):
+            row, error = validate(record)
+            if error:
+                stats["rejected"] += 1
+                if len(stats["errors"]) < MAX_REPORTED_ERRORS:
+                    stats["errors"].append((line_number, error))
+                continue
+            batch.append(row)
+            if len(batch) >= batch_size:
+                _insert_batch(batch)
+                stats["imported"] += len(batch)
+                batch = []
+                report()
+
+        if batch:
+            _insert_batch(batch)
+            stats["imported"] += len(batch)
+    finally:
+        if defer_index:
+            bd.rebuild_search_index()
+        bd.invalidate_caches()
+    report()
+    return stats
+
+# ------------------ Export ------------------
+
+def export_products(path, fmt=None, fetch_size=EXPORT_FETCH_SIZE):
+    """Write every listing to a CSV/JSONL file straight from the cursor. Returns rows written."""
+    fmt = detect_format(path, fmt)
+    written = 0
+    # One read transaction, so the export is a consistent snapshot even while writers run
+    with db_pool.snapshot(bd.DB_PATH) as conn, open(path, "w", encoding="utf-8", newline="") as f:
+        cursor = conn.execute(EXPORT_SQL)
+        writer = csv.writer(f) if fmt == "csv" else None
+        if writer:
+            writer.writerow(FIELDS)
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            if writer:
+                writer.writerows(rows)
+            else:
+                f.writelines(json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False) + "\n" for row in rows)
+            written += len(rows)
+    return written
+
+# ------------------ CLI ------------------
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Bulk import/export EcoFinds listings (CSV or JSON Lines)")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("path", help="file to read or write; format follows the extension")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="override the format")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="rows per transaction")
+    parser.add_argument("--defer-index", action="store_true",
+                        help="rebuild the search index once at the end instead of per row")
+    parser.add_argument("--db", default=bd.DB_PATH, help="path to product.db")
+    args = parser.parse_args()
+
+    bd.DB_PATH = args.db
+    if args.command == "import":
+        stats = import_products(args.path, args.format, args.batch_size, defer_index=args.defer_index)
+        for line_number, error in stats["errors"]:
+            print(f"  line {line_number}: {error}", file=sys.stderr)
+        print(f"Imported {stats['imported']:,} listings ({stats['rejected']:,} rejected) "
+              f"in {stats['seconds']:.1f}s, {stats['rows_per_second']:,.0f} rows/s")
+    else:
+        bd.create_product_table()
+        start = time.perf_counter()
+        written = export_products(args.path, args.format)
+        print(f"Exported {written:,} listings to {os.path.basename(args.path)} "
+              f"in {time.perf_counter() - start:.1f}s")
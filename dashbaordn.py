@@ -1,7 +1,4 @@
 import streamlit as st
-from PIL import Image
-import requests
-from io import BytesIO
 
 # # ----------------------------
 # # 🖼️ Cached image resizer (returns bytes or None)
@@ -142,47 +139,100 @@ from io import BytesIO
 
 #             st.markdown("—" * 20)
 import backend_db
+import render_cache
+
+SORT_OPTIONS = {"Newest": None, "Price: low to high": "asc", "Price: high to low": "desc"}
+
+def card_markup(row):
+    return (
+        f"### {row['title']}",
+        f"**💰 Price:** {row['price']}",
+        f"📍 Location: {row['location']}",
+        f"🗂️ Category: {row['category']}",
+    )
+
+def facet_selectbox(label, counts, key, format_value=str):
+    """Selectbox over facet values showing live counts; keeps the current choice even at zero."""
+    counts = dict(counts)
+    current = st.session_state.get(key, "All")
+    if current != "All" and current not in counts:
+        counts[current] = 0
+    return st.selectbox(
+        label,
+        ["All"] + list(counts),
+        key=key,
+        format_func=lambda v: v if v == "All" else f"{format_value(v)} ({counts[v]})",
+    )
 
 def show_dashboard():
     st.title("🛍️ Second-Hand Items Dashboard")
 
+    # Facet choices live in session state so the query can run before the facet widgets render
+    state = st.session_state
+    selected = {
+        facet: None if state.get(f"facet_{facet}", "All") == "All" else state[f"facet_{facet}"]
+        for facet in backend_db.FACETS
+    }
+
     # Sidebar filters
     with st.sidebar:
         st.header("🔍 Filter Items")
         search_query = st.text_input("Search by name")
-        categories = sorted({row["category"] for row in backend_db.get_all_products()})
-        selected_category = st.selectbox("Filter by category", ["All"] + categories)
 
-    # Fetch filtered products
-    if search_query:
-        products = backend_db.search_products(search_query)
-    else:
-        products = backend_db.get_all_products()
+        st.subheader("💰 Price")
+        min_price = st.number_input("Min price (₹)", min_value=0, value=0, step=500)
+        max_price = st.number_input("Max price in ₹ (0 = no limit)", min_value=0, value=0, step=500)
+        sort_label = st.selectbox("Sort by", list(SORT_OPTIONS))
+
+    # Rows and live facet counts for the current drill-down in one call, shared by
+    # every session until the catalogue changes
+    products, facets = render_cache.cached_query(
+        "faceted_search", backend_db.faceted_search,
+        keyword=search_query or None,
+        category=selected["category"],
+        location=selected["location"],
+        price_band=selected["price"],
+        min_price=min_price or None,
+        max_price=max_price or None,
+        sort=SORT_OPTIONS[sort_label],
+    )
 
-    if selected_category != "All":
-        products = [p for p in products if p["category"] == selected_category]
+    with st.sidebar:
+        st.subheader("🧭 Refine")
+        facet_selectbox("Category", facets["category"], "facet_category")
+        facet_selectbox("Location", facets["location"], "facet_location")
+        facet_selectbox("Price band", facets["price"], "facet_price", backend_db.price_band_label)
 
     # Show results
     st.subheader("📦 Available Listings")
     cols = st.columns(3)
-
-    for idx, row in enumerate(products):
+    # Only cards not seen at their current row version load a rendition
+    cards = render_cache.get_cards(products, "dashboard", card_markup)
+    # Card rows carry only seller_id; the sellers on screen come back in one (cached) query
+    sellers = render_cache.cached_query(
+        "sellers", backend_db.get_sellers, seller_ids=tuple(sorted({row["seller_id"] for row in products if row["seller_id"] is not None}))
+    )
+
+    for idx, (row, image, (title, price, location, category)) in enumerate(cards):
         with cols[idx % 3]:
             try:
-                st.image(row["image_url"], use_container_width=True)
+                # Prefer the rendition stored at ingest; fall back to letting the browser load the URL
+                st.image(image or row["image_url"], use_container_width=True)
             except Exception:
                 st.warning("Image unavailable")
 
-            st.markdown(f"### {row['title']}")
-            st.write(f"**💰 Price:** {row['price']}")
-            st.write(f"📍 Location: {row['location']}")
-            st.write(f"🗂️ Category: {row['category']}")
+            st.markdown(title)
+            st.write(price)
+            st.write(location)
+            st.write(category)
             st.markdown("**📝 Description:**")
             st.write(row["description"])
 
             st.markdown("---")
             st.markdown("**👤 Seller Info**")
-            st.write(f"**Name:** {row['seller_name']}")
-            st.write(f"📆 Member since: {row['seller_since']}")
-            st.write(f"📞 Phone: {row['seller_phone']}")
-            st.write(f"📧 Email: {row['seller_email']}")
+            seller = sellers.get(row["seller_id"])
+            if seller:
+                st.write(f"**Name:** {seller['name']}")
+                st.write(f"📆 Member since: {seller['member_since']}")
+                st.write(f"📞 Phone: {seller['phone']}")
+                st.write(f"📧 Email: {seller['email']}")
@@ -0,0 +1,133 @@
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+
+# Tuned for a read-heavy Streamlit app with a handful of concurrent writers
+BUSY_TIMEOUT_SECONDS = 5.0
+STATEMENT_CACHE_SIZE = 256   # prepared statements kept per connection
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA mmap_size = 268435456",   # 256 MB
+    "PRAGMA cache_size = -16000",     # ~16 MB page cache
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA foreign_keys = ON",
+)
+
+_local = threading.local()
+_idle = {}                 # path -> list of connections released by finished threads
+_write_locks = {}          # path -> RLock serializing writers inside this process
+_guard = threading.Lock()
+
+# ------------------ Connections ------------------
+
+class _Lease:
+    """Ties a pooled connection to the thread-local storage of the thread using it."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.finalizer = None
+
+def _open(path):
+    conn = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT_SECONDS,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=False,   # connections are handed to a new thread once the old one exits
+    )
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def _release(path, conn):
+    """Return a connection to the idle pool when its owning thread goes away."""
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+    except sqlite3.Error:
+        conn.close()
+        return
+    with _guard:
+        _idle.setdefault(path, []).append(conn)
+
+def get_connection(path):
+    """Return this thread's connection to the database at path.
+
+    Each thread keeps one connection per database for its lifetime; when the
+    thread exits (e.g. a finished Streamlit script run) the connection goes back
+    to a shared idle pool instead of being closed. Callers must not close it.
+    """
+    leases = getattr(_local, "leases", None)
+    if leases is None:
+        leases = _local.leases = {}
+
+    lease = leases.get(path)
+    if lease is None:
+        with _guard:
+            idle = _idle.get(path)
+            conn = idle.pop() if idle else None
+        if conn is None:
+            conn = _open(path)
+        lease = leases[path] = _Lease(conn)
+        lease.finalizer = weakref.finalize(lease, _release, path, conn)
+    return lease.conn
+
+# ------------------ Transactions ------------------
+
+def _write_lock(path):
+    with _guard:
+        lock = _write_locks.get(path)
+        if lock is None:
+            lock = _write_locks[path] = threading.RLock()
+    return lock
+
+@contextmanager
+def transaction(path):
+    """Run a block as one write transaction on this thread's connection.
+
+    Writers in this process queue on a lock instead of spinning on SQLITE_BUSY,
+    and BEGIN IMMEDIATE takes the database write lock up front so concurrent
+    processes fail fast (after busy_timeout) rather than deadlocking on upgrade.
+    Nested calls join the outer transaction.
+    """
+    conn = get_connection(path)
+    with _write_lock(path):
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+
+@contextmanager
+def snapshot(path):
+    """Run several reads against one consistent view of the database."""
+    conn = get_connection(path)
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        conn.commit()
+
+def close_all():
+    """Close idle pooled connections and the calling thread's own connections."""
+    with _guard:
+        idle = [conn for conns in _idle.values() for conn in conns]
+        _idle.clear()
+    leases = getattr(_local, "leases", {})
+    for lease in leases.values():
+        lease.finalizer.detach()
+        idle.append(lease.conn)
+    leases.clear()
+    for conn in idle:
+        conn.close()
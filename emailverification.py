@@ -86,76 +86,145 @@
 #         return False
 
 import os
-import random
-import time
-from dotenv import load_dotenv
-import sib_api_v3_sdk
-from sib_api_v3_sdk.rest import ApiException
-
-# Load environment variables
-load_dotenv()
-
-BREVO_API_KEY = os.getenv("BREVO_API_KEY")
-SENDER_EMAIL = os.getenv("SENDER_EMAIL")
-SMS_SENDER = os.getenv("BREVO_SMS_SENDER")
-
-# OTP expiry time (in seconds)
-OTP_TTL_SECONDS = 300  # 5 minutes
-
-def gen_otp():
-    """Generate a 6-digit OTP."""
-    return str(random.randint(100000, 999999))
-
-def now_ts():
-    """Return current timestamp in seconds."""
-    return int(time.time())
-
-def otp_is_valid(stored_time):
-    """Check if OTP is still valid based on stored timestamp."""
-    return (now_ts() - int(stored_time)) <= OTP_TTL_SECONDS
-
-def send_email_otp(to_email, otp):
-    """Send OTP via Brevo email service."""
-    configuration = sib_api_v3_sdk.Configuration()
-    configuration.api_key['api-key'] = BREVO_API_KEY
-
-    api_instance = sib_api_v3_sdk.TransactionalEmailsApi(sib_api_v3_sdk.ApiClient(configuration))
-    subject = "Your OTP Verification Code"
-    html_content = f"<p>Your OTP is: <b>{otp}</b></p>"
-
-    sender = {"name": "OTP System", "email": SENDER_EMAIL}
-    to = [{"email": to_email}]
-
-    email = sib_api_v3_sdk.SendSmtpEmail(to=to, sender=sender, subject=subject, html_content=html_content)
-
-    try:
-        api_instance.send_transac_email(email)
-        print("✅ OTP sent successfully via Brevo Email!")
-        return True
-    except ApiException as e:
-        print(f"❌ Error sending email: {e}")
-        return False
-
-def send_sms_otp(phone_number, otp):
-    """Send OTP via SMS using Brevo."""
-    configuration = sib_api_v3_sdk.Configuration()
-    configuration.api_key['api-key'] = BREVO_API_KEY
-
-    api_instance = sib_api_v3_sdk.TransactionalSMSApi(sib_api_v3_sdk.ApiClient(configuration))
-    message = f"Your OTP code is: {otp}"
-
-    try:
-        send_sms = sib_api_v3_sdk.SendTransacSms(
-            sender=SMS_SENDER,
-            recipient=phone_number,
-            content=message
+import threading
+import outbox
+import metrics
+
+# The Brevo SDK and .env settings are loaded on the first send, not at import:
+# the login form and the OTP queue never need them in the web process
+_settings = None
+
+# ------------------ Brevo client ------------------
+
+def get_settings():
+    """Brevo credentials from the environment (and .env), read once."""
+    global _settings
+    if _settings is None:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        _settings = {
+            "api_key": os.getenv("BREVO_API_KEY"),
+            "sender_email": os.getenv("SENDER_EMAIL"),
+            "sms_sender": os.getenv("BREVO_SMS_SENDER"),
+        }
+    return _settings
+
+def _sdk():
+    import sib_api_v3_sdk
+    return sib_api_v3_sdk
+
+# Message templates the outbox can send: name -> (subject, html with {{params.x}}, sms text)
+TEMPLATES = {
+    "otp": (
+        "Your OTP Verification Code",
+        "<p>Your OTP is: <b>{{params.otp}}</b></p>",
+        "Your OTP code is: {otp}",
+    ),
+}
+
+_client_lock = threading.Lock()
+_api_client = None
+_email_api = None
+_sms_api = None
+
+def get_email_api():
+    """One TransactionalEmailsApi (and HTTP connection pool) shared by every send."""
+    global _email_api
+    with _client_lock:
+        if _email_api is None:
+            _email_api = _sdk().TransactionalEmailsApi(_get_api_client())
+        return _email_api
+
+def get_sms_api():
+    global _sms_api
+    with _client_lock:
+        if _sms_api is None:
+            _sms_api = _sdk().TransactionalSMSApi(_get_api_client())
+        return _sms_api
+
+def _get_api_client():
+    global _api_client
+    if _api_client is None:
+        sdk = _sdk()
+        configuration = sdk.Configuration()
+        configuration.api_key['api-key'] = get_settings()["api_key"]
+        _api_client = sdk.ApiClient(configuration)
+    return _api_client
+
+class BrevoProvider:
+    """Outbox provider that delivers through the shared Brevo client.
+
+    Emails with the same template go out as one API call using message
+    versions (one version per recipient, each with its own params). If that
+    call fails, each email is retried alone, so one bad recipient only fails
+    its own message. SMS has no batch endpoint, so those are sent one by one
+    over the same client.
+    """
+
+    def send_batch(self, messages):
+        results = {}
+        emails = {}
+        for message in messages:
+            if message["channel"] == "email":
+                emails.setdefault(message["template"], []).append(message)
+            else:
+                results[message["id"]] = self.send_sms(message)
+
+        for template, group in emails.items():
+            error = self.send_emails(template, group)
+            for message in group:
+                if error is not None and len(group) > 1:
+                    results[message["id"]] = self.send_emails(template, [message])
+                else:
+                    results[message["id"]] = error
+        return results
+
+    @metrics.timed("brevo.send_emails")
+    def send_emails(self, template, messages):
+        sdk = _sdk()
+        subject, html_template, _ = TEMPLATES[template]
+        email = sdk.SendSmtpEmail(
+            sender={"name": "OTP System", "email": get_settings()["sender_email"]},
+            subject=subject,
+            html_content=html_template,
+            message_versions=[
+                sdk.SendSmtpEmailMessageVersions(
+                    to=[{"email": message["recipient"]}], params=message["params"]
+                )
+                for message in messages
+            ],
         )
-        api_instance.send_transac_sms(send_sms)
-        print("✅ OTP sent successfully via SMS!")
-        return True
-    except ApiException as e:
-        print(f"❌ Error sending SMS: {e}")
-        return False
-
-    
-
+        try:
+            get_email_api().send_transac_email(email)
+            return None
+        except sdk.rest.ApiException as e:
+            print(f"❌ Error sending email batch: {e}")
+            return e
+
+    @metrics.timed("brevo.send_sms")
+    def send_sms(self, message):
+        sdk = _sdk()
+        content = TEMPLATES[message["template"]][2].format(**message["params"])
+        try:
+            get_sms_api().send_transac_sms(sdk.SendTransacSms(
+                sender=get_settings()["sms_sender"], recipient=message["recipient"], content=content
+            ))
+            return None
+        except sdk.rest.ApiException as e:
+            print(f"❌ Error sending SMS: {e}")
+            return e
+
+# ------------------ Queued sending ------------------
+
+def queue_email_otp(to_email, otp):
+    """Queue the OTP email for background delivery; returns a message id for delivery_status()."""
+    return outbox.enqueue("email", to_email, "otp", {}, secret_params={"otp": otp})
+
+def queue_sms_otp(phone_number, otp):
+    return outbox.enqueue("sms", phone_number, "otp", {}, secret_params={"otp": otp})
+
+def delivery_status(message_id):
+    """"pending", "sending", "sent", "failed" or None if the id is unknown."""
+    status = outbox.delivery_status(message_id)
+    return status["status"] if status else None
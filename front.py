@@ -1,40 +1,37 @@
 
 import streamlit as st
-import json
-import os
-import hashlib
 import re
-import emailverification as verify   # OTP + email/SMS sender
-import dashbaordn as dashboard
-import backend_db as bd
-import home 
-
-USER_FILE = "users.json"
-bd.create_product_table()
-
-
-def load_users():
-    if os.path.exists(USER_FILE):
-        with open(USER_FILE, "r") as f:
-            try:
-                return json.load(f)
-            except:
-                return {}
-    return {}
-
-def save_users(users):
-    with open(USER_FILE, "w") as f:
-        json.dump(users, f, indent=4)
-
-# Hash password
+import emailverification as verify   # OTP + email/SMS sender (the Brevo SDK loads on first send)
+import user_db
+import otp_store
+import rate_limit
+import sessions
+import passwords
+import metrics
+
+# The catalogue pages (backend_db, thumbnails, requests/PIL) are imported on the
+# first Main render, so the login page comes up without them. Both databases
+# migrate themselves on first use.
+
+# Hash password (salted scrypt on the shared hashing pool)
 def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+    return passwords.hash_password(password)
+
+def check_password(user, password):
+    """Verify a login and transparently upgrade legacy or outdated hashes."""
+    ok, upgrade = passwords.verify_password(password, user["password_hash"])
+    if upgrade:
+        user_db.update_password(user["email"], hash_password(password))
+    return ok
 
 def valid_name(name):
     return bool(re.match(r"^[A-Za-z]+( [A-Za-z]+)+$", name))
 
 st.set_page_config(page_title="EcoFinds Login", page_icon="🛒", layout="centered")
 
+# Per-rerun timings and db call counts (metrics.py); closed at the bottom of the script
+metrics.begin_rerun("front")
+
 # session-state initializations
 if "page" not in st.session_state:
     st.session_state.page = "Login"
@@ -42,15 +39,20 @@ if "registered_email" not in st.session_state:
     st.session_state.registered_email = ""
 if "pending_otp" not in st.session_state:
     st.session_state.pending_otp = ""
-if "pending_otp_time" not in st.session_state:
-    st.session_state.pending_otp_time = 0
 if "email_verified" not in st.session_state:
     st.session_state.email_verified = False
 
 # ------------------- Styling block (unchanged) -------------------
 st.markdown(""" ... (CSS block unchanged) ... """, unsafe_allow_html=True)
 
-users = load_users()
+# Logins live in the server-side session store (token in a cookie), so they
+# survive reconnects and work on any server process
+session = sessions.current_session()
+if session and st.session_state.page == "Login":
+    st.session_state.page = "Main"
+elif not session and st.session_state.page == "Main":
+    st.session_state.page = "Login"
+
 page = st.session_state.page
 
 if page == "Login":
@@ -81,19 +83,25 @@ if page == "Login":
     password = st.text_input("Password", type="password", placeholder="Enter your password here")
 
     if st.button("Login"):
-        if email in users and users[email]["password"] == hash_password(password):
-            st.success(f"Welcome back, {users[email]['name']}!")
-            st.session_state.page = "Main"
-            st.rerun()
+        # Throttled before the lookup and the password hash
+        allowed, retry_after = rate_limit.allow("login", email)
+        if not allowed:
+            st.error(rate_limit.retry_message(retry_after))
         else:
-            st.error("Invalid email or password")
+            user = user_db.get_user(email)
+            if user and check_password(user, password):
+                st.success(f"Welcome back, {user['name']}!")
+                sessions.login(user)
+                st.session_state.page = "Main"
+                st.rerun()
+            else:
+                st.error("Invalid email or password")
 
     st.write("New to EcoFinds?")
     if st.button("Create your EcoFinds account"):
         st.session_state.page = "Register"
         st.session_state.registered_email = ""
         st.session_state.pending_otp = ""
-        st.session_state.pending_otp_time = 0
         st.session_state.email_verified = False
         st.rerun()
 
@@ -119,32 +127,53 @@ elif page == "Register":
             if "@" not in email or "." not in email:
                 st.error("Enter a valid email first.")
             else:
-                otp = verify.gen_otp()
-                st.session_state.pending_otp = otp
-                st.session_state.pending_otp_time = verify.now_ts()
-                st.session_state.registered_email = email
-                st.session_state.email_verified = False
-
-                # Try to send real email
-                sent = verify.send_email_otp(email, otp)
-                if sent:
-                    st.info("OTP sent to your email. Please check your inbox.")
+                # Throttled before the DB write and the queued email
+                allowed, retry_after = rate_limit.allow("otp_send", email)
+                if not allowed:
+                    st.error(rate_limit.retry_message(retry_after))
                 else:
-                    # fallback simulation if email fails
-                    st.warning("Email sending failed. (Showing OTP for testing only)")
-                    st.success(f"Testing OTP (do not use in production): {otp}")
+                    # The OTP store keeps the (hashed) code, so any worker can verify it;
+                    # the session copy is only for the testing fallback below
+                    otp = otp_store.issue(email, "register")
+                    st.session_state.pending_otp = otp
+                    st.session_state.registered_email = email
+                    st.session_state.email_verified = False
+
+                    # Queue the email; a background worker delivers it while the page stays responsive
+                    st.session_state.otp_message_id = verify.queue_email_otp(email, otp)
+
+        # Delivery status is polled from the outbox on each rerun
+        message_id = st.session_state.get("otp_message_id")
+        if message_id and st.session_state.pending_otp:
+            status = verify.delivery_status(message_id)
+            if status == "sent":
+                st.info("OTP sent to your email. Please check your inbox.")
+            elif status == "failed":
+                # fallback simulation if email fails
+                st.warning("Email sending failed. (Showing OTP for testing only)")
+                st.success(f"Testing OTP (do not use in production): {st.session_state.pending_otp}")
+            else:
+                st.info("Sending OTP…")
+                st.button("Refresh status", key="refresh_otp_status")
 
     with col2:
         otp_input = st.text_input("Enter OTP", key="reg_email_otp", placeholder="6-digit OTP")
         if st.button("Verify Email OTP", key="verify_email_otp"):
-            if (st.session_state.pending_otp == "" or st.session_state.registered_email != email):
-                st.error("No OTP pending for this email. Click Send OTP first.")
+            allowed, retry_after = rate_limit.allow("otp_verify", email)
+            if not allowed:
+                st.error(rate_limit.retry_message(retry_after))
             else:
-                if not verify.otp_is_valid(st.session_state.pending_otp_time):
-                    st.error("OTP expired. Click Send OTP again.")
-                elif otp_input.strip() == st.session_state.pending_otp:
+                ok, reason = otp_store.verify(email, "register", otp_input)
+                if ok:
                     st.session_state.email_verified = True
+                    st.session_state.pending_otp = ""
                     st.success("Email verified ✅")
+                elif reason == "missing":
+                    st.error("No OTP pending for this email. Click Send OTP first.")
+                elif reason == "expired":
+                    st.error("OTP expired. Click Send OTP again.")
+                elif reason == "locked":
+                    st.error("Too many incorrect attempts. Click Send OTP again.")
                 else:
                     st.error("Incorrect OTP.")
 
@@ -173,22 +202,17 @@ elif page == "Register":
             st.error("Please enter a valid full name (first and last name).")
         elif "@" not in email or "." not in email:
             st.error("Enter a valid email address.")
-        elif email in users:
+        elif user_db.user_exists(email):
             st.warning("Email already registered.")
         elif password != confirm_password:
             st.error("Passwords do not match.")
         elif not all_ok:
             st.error("Password must meet all the requirements shown above.")
+        elif not user_db.create_user(email, name, hash_password(password), dob=str(dob), verified=True):
+            st.warning("Email already registered.")
         else:
-            users[email] = {
-                "name": name,
-                "dob": str(dob),
-                "password": hash_password(password),
-                "verified": True
-            }
-            save_users(users)
             st.success("Registration successful! You are now logged in.")
-            st.session_state.temp_login_email = email
+            sessions.login(user_db.get_user(email))
             st.session_state.page = "Main"
             st.rerun()
 
@@ -202,26 +226,40 @@ elif page == "Forgot":
     confirm_new_password = st.text_input("Confirm New Password", type="password")
 
     if st.button("Reset"):
-        if email not in users:
+        allowed, retry_after = rate_limit.allow("password_reset", email)
+        if not allowed:
+            st.error(rate_limit.retry_message(retry_after))
+        elif not user_db.user_exists(email):
             st.error("Email not registered")
         elif new_password != confirm_new_password:
             st.error("Passwords do not match")
+        elif not user_db.update_password(email, hash_password(new_password)):
+            st.error("Email not registered")
         else:
-            users[email]["password"] = hash_password(new_password)
-            save_users(users)
             st.success("Password updated successfully! Please login again.")
+            sessions.revoke_user(user_db.normalize_email(email))
             st.session_state.page = "Login"
             st.rerun()
     st.markdown("</div>", unsafe_allow_html=True)
 
 elif page == "Main":
+    import home
+    import dashbaordn as dashboard
+
     st.title("Welcome to EcoFinds 🛒")
     
     home.homepage()
     if st.button("profile"):
        dashboard.show_dashboard()
 
+    # Set ECOFINDS_ADMIN_EMAILS to see the latency panel
+    if metrics.is_admin(session["email"]):
+        with st.expander("⏱️ Performance"):
+            metrics.render_panel()
+
     if st.button("Logout"):
+        sessions.logout()
         st.session_state.page = "Login"
         st.rerun()
 
+metrics.end_rerun()
@@ -1,14 +1,14 @@
+import html
 import streamlit as st
-from io import BytesIO
-from PIL import Image
-import sqlite3
-import requests
+import db_pool
+import backend_db as bd
+import render_cache
 
 # -------------------- Page config --------------------
-st.set_page_config(page_title="EcoFinds Marketplace", layout="wide")
+# Only when run on its own; front.py imports this lazily and owns its page config
+if __name__ == "__main__":
+    st.set_page_config(page_title="EcoFinds Marketplace", layout="wide")
 def insert_sample_products():
-    conn = get_product_conn()
-    cur = conn.cursor()
 
     sample_products = [
         (
@@ -34,37 +34,12 @@ def insert_sample_products():
         )
     ]
 
-    cur.executemany('''
-        INSERT INTO products 
-        (title, price, location, category, description, image_url, 
-         seller_name, seller_since, seller_phone, seller_email, seller_photo)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', sample_products)
-
-    conn.commit()
-    conn.close()
-
-def init_products_table():
-    conn = get_product_conn()
-    cur = conn.cursor()
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS products (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            price TEXT,
-            location TEXT,
-            category TEXT,
-            description TEXT,
-            image_url TEXT,
-            seller_name TEXT,
-            seller_since TEXT,
-            seller_phone TEXT,
-            seller_email TEXT,
-            seller_photo TEXT
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    # Tuples follow bd.LISTING_FIELDS; sellers go into their own table
+    with db_pool.transaction(bd.DB_PATH) as conn:
+        bd.insert_listings(conn.cursor(), sample_products)
+
+    # Precompute image renditions for the new rows
+    bd.backfill_renditions()
 
 # Optional: small dark-mode polish
 DARK_CSS = """
@@ -95,75 +70,79 @@ h1,h2,h3,h4,h5,h6 { color: var(--fg); }
 st.markdown(DARK_CSS, unsafe_allow_html=True)
 
 # -------------------- DB helpers --------------------
-PRODUCT_DB = "product.db"
-
 def get_product_conn():
-    conn = sqlite3.connect(PRODUCT_DB)
-    conn.row_factory = sqlite3.Row
-    return conn
+    # Same pooled connection backend_db uses; do not close it
+    return bd.get_db_connection()
 
 def get_all_products_db():
-    conn = get_product_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM products")
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+    # Card projection only: no seller details or other columns the grid doesn't render
+    return bd.get_all_products("card")
 
 def get_product_by_id(product_id: int):
-    conn = get_product_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM products WHERE id = ?", (product_id,))
-    row = cur.fetchone()
-    conn.close()
-    return row
-
-# -------------------- Image helper --------------------
-@st.cache_data(show_spinner=False)
-def get_resized_image_bytes(url: str, max_size=(500, 380)):
-    try:
-        resp = requests.get(url, timeout=6)
-        resp.raise_for_status()
-        img = Image.open(BytesIO(resp.content)).convert("RGB")
-        img.thumbnail(max_size, Image.Resampling.LANCZOS)
-        buf = BytesIO()
-        img.save(buf, format="JPEG", quality=85, optimize=True)
-        return buf.getvalue()
-    except Exception:
-        return None
+    # Read-through cache shared by all sessions; add/delete in backend_db invalidate it
+    return bd.get_product(product_id)
 
 # -------------------- Pages --------------------
 def homepage():
-    # Initialize DB + Insert sample data only if empty
-    init_products_table()   
-    if not get_all_products_db():  # only insert if table is empty
-        insert_sample_products()
-
     st.title("🛒 EcoFinds Marketplace")
     st.caption("Scroll the latest second-hand listings")
 
-    products = get_all_products_db()
-    if not products:
+    # Keyset-paged feed: rows loaded so far stay in the session, "Load more" fetches the next page.
+    # While the catalogue version is unchanged a rerun doesn't query the products at all.
+    if "feed_products" not in st.session_state and not bd.has_products():
+        # First feed of this session on an empty catalogue: seed the sample listings
+        insert_sample_products()
+    version = bd.get_catalog_version()
+    if "feed_products" not in st.session_state:
+        first_page, st.session_state.feed_cursor = bd.get_products_page()
+        st.session_state.feed_products = list(first_page)
+        st.session_state.feed_version = version
+    elif st.session_state.feed_version != version:
+        # Re-read only the range already loaded, so the shopper keeps their place:
+        # new listings appear on top, edits and deletions show, the cursor stays put
+        st.session_state.feed_products = list(bd.get_products_down_to(st.session_state.feed_cursor))
+        st.session_state.feed_version = version
+
+    if not st.session_state.feed_products:
         st.info("No products found. Add some listings to get started!")
         return
+    feed_grid()
+
+def card_markup(product):
+    # Listing fields are user input: escaped, so a listing can't inject script next to the session cookie
+    title, price, location, category = (
+        html.escape(str(product[field] or "")) for field in ("title", "price", "location", "category")
+    )
+    return (
+        f'<div class="ec-title">{title}</div>',
+        f'<div class="ec-price">💰 {price}</div>',
+        f'<div class="ec-meta">📍 {location} &nbsp;•&nbsp; 🏷️ {category}</div>',
+    )
+
+def load_more():
+    next_page, st.session_state.feed_cursor = bd.get_products_page(st.session_state.feed_cursor)
+    st.session_state.feed_products.extend(next_page)
+
+@st.fragment
+def feed_grid():
+    # A fragment: expanders and "Load more" rerun only the grid, not the whole page
+    products = st.session_state.feed_products
+    # Renditions and markup come from the shared card cache, keyed by (id, row version)
+    cards = render_cache.get_cards(products, "home", card_markup)
 
     # Responsive grid: 3 per row on desktop
-    for i in range(0, len(products), 3):
+    for i in range(0, len(cards), 3):
         cols = st.columns(3, gap="large")
-        for col, product in zip(cols, products[i:i+3]):
+        for col, (product, img_bytes, (title, price, meta)) in zip(cols, cards[i:i+3]):
             with col:
-                img_bytes = get_resized_image_bytes(product["image_url"])
                 if img_bytes:
                     st.image(img_bytes, use_container_width=True)
                 else:
                     st.empty()
 
-                st.markdown(f'<div class="ec-title">{product["title"]}</div>', unsafe_allow_html=True)
-                st.markdown(f'<div class="ec-price">💰 {product["price"]}</div>', unsafe_allow_html=True)
-                st.markdown(
-                    f'<div class="ec-meta">📍 {product["location"]} &nbsp;•&nbsp; 🏷️ {product["category"]}</div>',
-                    unsafe_allow_html=True
-                )
+                st.markdown(title, unsafe_allow_html=True)
+                st.markdown(price, unsafe_allow_html=True)
+                st.markdown(meta, unsafe_allow_html=True)
                 with st.expander("📖 Description"):
                     st.write(product["description"])
 
@@ -172,6 +151,12 @@ def homepage():
                     st.session_state.selected_id = int(product["id"])
                     st.rerun()
 
+    if st.session_state.feed_cursor is not None:
+        # The callback runs before the fragment reruns, so the new cards render in that same pass
+        st.button("Load more", key="feed_load_more", on_click=load_more)
+    else:
+        st.caption("You're all caught up.")
+
 def product_detail():
     if "selected_id" not in st.session_state or st.session_state.selected_id is None:
         st.session_state.page = "Home"
@@ -188,7 +173,7 @@ def product_detail():
     colA, colB = st.columns([3, 2], gap="large")
 
     with colA:
-        img_bytes = get_resized_image_bytes(product["image_url"], max_size=(1200, 900))
+        img_bytes = bd.get_rendition(product["id"], "detail")
         if img_bytes:
             st.image(img_bytes, use_container_width=True)
         st.header(product["title"])
@@ -200,7 +185,7 @@ def product_detail():
     with colB:
         st.markdown("### 🧑‍💼 Seller")
         if product["seller_photo"]:
-            s_img = get_resized_image_bytes(product["seller_photo"], max_size=(220, 220))
+            s_img = bd.get_seller_rendition(product["seller_id"])
             if s_img:
                 st.image(s_img, width=120)
         st.write(f"**{product['seller_name']}**")
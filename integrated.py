@@ -1,100 +1,82 @@
-import os
 import sqlite3
-import hashlib
-import random
-from datetime import datetime
 import streamlit as st
-from dotenv import load_dotenv
-import sib_api_v3_sdk
-
-# Load environment variables
-load_dotenv()
-API_KEY = os.getenv("BREVO_API_KEY")
-SENDER_EMAIL = os.getenv("SENDER_EMAIL")
-SENDER_NAME = os.getenv("SENDER_NAME", "")
-
-# Configure Brevo (Sendinblue) client
-configuration = sib_api_v3_sdk.Configuration()
-configuration.api_key['api-key'] = API_KEY
-smtp_client = sib_api_v3_sdk.TransactionalEmailsApi(sib_api_v3_sdk.ApiClient(configuration))
-
-# Initialize SQLite database
-conn = sqlite3.connect('users.db', check_same_thread=False)
-c = conn.cursor()
-c.execute('''
-CREATE TABLE IF NOT EXISTS users (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT,
-    email TEXT UNIQUE,
-    password_hash TEXT,
-    is_verified INTEGER,
-    otp_code TEXT,
-    otp_expiry INTEGER
-)
-''')
-conn.commit()
+import db_pool
+import passwords
+import outbox
+import otp_store
+import rate_limit
+import sessions
+import migrations
+import metrics
+
+# Connections come from the shared per-thread pool; the schema is migrated
+# on first use (once per process), not at import or on every rerun
+USER_DB = 'users.db'
+
+def get_connection():
+    migrations.ensure_user_schema(USER_DB)
+    return db_pool.get_connection(USER_DB)
+
+def transaction():
+    migrations.ensure_user_schema(USER_DB)
+    return db_pool.transaction(USER_DB)
 
 # Utility functions
 def hash_password(password):
-    return hashlib.sha256(password.encode('utf-8')).hexdigest()
+    return passwords.hash_password(password)
+
+def check_password(user, password):
+    """Verify a login and transparently upgrade legacy or outdated hashes."""
+    ok, upgrade = passwords.verify_password(password, user["password_hash"])
+    if upgrade:
+        # Hash outside the transaction: scrypt must not run under the users.db write lock
+        pwd_hash = hash_password(password)
+        with transaction() as conn:
+            conn.execute("UPDATE users SET password_hash=? WHERE id=?", (pwd_hash, user["id"]))
+    return ok
 
 def create_user(name, email, password):
     pwd_hash = hash_password(password)
     try:
-        c.execute("INSERT INTO users (name, email, password_hash, is_verified) VALUES (?, ?, ?, 0)",
-                  (name, email, pwd_hash))
-        conn.commit()
+        with transaction() as conn:
+            conn.execute("INSERT INTO users (name, email, password_hash, is_verified) VALUES (?, ?, ?, 0)",
+                         (name, email, pwd_hash))
         return True
     except sqlite3.IntegrityError:
         return False
 
 def get_user(email):
-    c.execute("SELECT * FROM users WHERE email=?", (email,))
-    return c.fetchone()
+    conn = get_connection()
+    return conn.execute("SELECT * FROM users WHERE email=?", (email,)).fetchone()
 
 def set_user_verified(email):
-    c.execute("UPDATE users SET is_verified=1, otp_code=NULL, otp_expiry=NULL WHERE email=?", (email,))
-    conn.commit()
+    with transaction() as conn:
+        conn.execute("UPDATE users SET is_verified=1 WHERE email=?", (email,))
 
 def update_password(email, new_password):
     pwd_hash = hash_password(new_password)
-    c.execute("UPDATE users SET password_hash=?, otp_code=NULL, otp_expiry=NULL WHERE email=?", (pwd_hash, email))
-    conn.commit()
-
-def generate_otp():
-    return str(random.randint(100000, 999999))
+    with transaction() as conn:
+        conn.execute("UPDATE users SET password_hash=? WHERE email=?", (pwd_hash, email))
 
 def send_otp(email, context):
-    otp = generate_otp()
-    expiry = int(datetime.now().timestamp()) + 300
-    c.execute("UPDATE users SET otp_code=?, otp_expiry=? WHERE email=?", (otp, expiry, email))
-    conn.commit()
-    # Email content with the OTP
-    subject = "Your verification code"
-    content = f"<p>Your OTP code is: <strong>{otp}</strong>. It will expire in 5 minutes.</p>"
-    send_smtp_email = sib_api_v3_sdk.SendSmtpEmail(
-        to=[{"email": email}],
-        html_content=content,
-        sender={"name": SENDER_NAME, "email": SENDER_EMAIL},
-        subject=subject
-    )
-    try:
-        smtp_client.send_transac_email(send_smtp_email)
-    except Exception as e:
-        print("Error sending email:", e)
-
-def verify_user_otp(email, otp_input):
-    user = get_user(email)
-    if not user:
+    # Codes live in the shared OTP store keyed by (email, purpose), hashed and expiring
+    otp = otp_store.issue(email, context)
+    # Delivered by the outbox worker (shared Brevo client, retries); the rerun doesn't wait on Brevo
+    return outbox.enqueue("email", email, "otp", {}, secret_params={"otp": otp})
+
+OTP_MESSAGES = {
+    "verified": "OTP verified",
+    "missing": "No OTP to verify",
+    "expired": "OTP expired",
+    "locked": "Too many incorrect attempts. Request a new OTP",
+    "invalid": "Invalid OTP",
+}
+
+def verify_user_otp(email, otp_input, context):
+    if not get_user(email):
         return False, "User not found"
-    otp_stored, expiry = user[5], user[6]
-    if otp_stored is None:
-        return False, "No OTP to verify"
-    if int(datetime.now().timestamp()) > expiry:
-        return False, "OTP expired"
-    if otp_input == otp_stored:
-        return True, "OTP verified"
-    return False, "Invalid OTP"
+    ok, reason = otp_store.verify(email, context, otp_input)
+    return ok, OTP_MESSAGES[reason]
 
 # Inject custom CSS for styling
 st.markdown("""
@@ -134,11 +116,10 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+# Per-rerun timings and db call counts (metrics.py); closed at the bottom of the script
+metrics.begin_rerun("integrated")
+
 # Initialize session state
-if 'logged_in' not in st.session_state:
-    st.session_state.logged_in = False
-if 'user_email' not in st.session_state:
-    st.session_state.user_email = ""
 if 'register_email' not in st.session_state:
     st.session_state.register_email = ""
 if 'reset_email' not in st.session_state:
@@ -149,14 +130,14 @@ if 'reset_verified' not in st.session_state:
 # Sidebar navigation
 page = st.sidebar.selectbox("Navigation", ["Login", "Register", "Reset Password"])
 
-# Logged-in view
-if st.session_state.logged_in:
-    user = get_user(st.session_state.user_email)
-    st.title(f"Welcome, {user[1]}!")
+# Logged-in view: the user comes from the session cache, not the users table
+session = sessions.current_session()
+if session:
+    st.title(f"Welcome, {session['name']}!")
     st.write("You have successfully logged in and verified your email.")
     if st.button("Logout"):
-        st.session_state.logged_in = False
-        st.session_state.user_email = ""
+        sessions.logout()
+        st.rerun()
 else:
     # Login page
     if page == "Login":
@@ -164,14 +145,16 @@ else:
         login_email = st.text_input("Email")
         login_password = st.text_input("Password", type="password")
         if st.button("Login"):
-            user = get_user(login_email)
-            if user:
-                pwd_hash = hash_password(login_password)
-                if pwd_hash == user[3]:
-                    if user[4] == 1:
-                        st.session_state.logged_in = True
-                        st.session_state.user_email = login_email
-                        st.experimental_rerun()
+            # Throttled before the lookup and the password hash
+            allowed, retry_after = rate_limit.allow("login", login_email)
+            user = get_user(login_email) if allowed else None
+            if not allowed:
+                st.error(rate_limit.retry_message(retry_after))
+            elif user:
+                if check_password(user, login_password):
+                    if user["is_verified"] == 1:
+                        sessions.login(user)
+                        st.rerun()
                     else:
                         st.error("Email not verified. Please register or verify.")
                 else:
@@ -188,7 +171,11 @@ else:
             reg_password = st.text_input("Password", type="password")
             reg_password2 = st.text_input("Confirm Password", type="password")
             if st.button("Register"):
-                if reg_password != reg_password2:
+                # Registration hashes a password and sends an OTP, so it shares the OTP send limit
+                allowed, retry_after = rate_limit.allow("otp_send", reg_email)
+                if not allowed:
+                    st.error(rate_limit.retry_message(retry_after))
+                elif reg_password != reg_password2:
                     st.error("Passwords do not match.")
                 elif get_user(reg_email):
                     st.error("Email already registered. Please log in.")
@@ -204,7 +191,11 @@ else:
             st.info(f"Enter the OTP sent to {st.session_state.register_email}")
             otp_input = st.text_input("OTP Code")
             if st.button("Verify OTP"):
-                ok, msg = verify_user_otp(st.session_state.register_email, otp_input)
+                allowed, retry_after = rate_limit.allow("otp_verify", st.session_state.register_email)
+                if allowed:
+                    ok, msg = verify_user_otp(st.session_state.register_email, otp_input, "register")
+                else:
+                    ok, msg = False, rate_limit.retry_message(retry_after)
                 if ok:
                     set_user_verified(st.session_state.register_email)
                     st.success("Email verified! You can now log in.")
@@ -218,8 +209,11 @@ else:
         if not st.session_state.reset_email:
             reset_email = st.text_input("Registered Email")
             if st.button("Send OTP"):
-                user = get_user(reset_email)
-                if user:
+                allowed, retry_after = rate_limit.allow("otp_send", reset_email)
+                user = get_user(reset_email) if allowed else None
+                if not allowed:
+                    st.error(rate_limit.retry_message(retry_after))
+                elif user:
                     send_otp(reset_email, context="reset")
                     st.session_state.reset_email = reset_email
                     st.info("An OTP has been sent to your email. Enter it below.")
@@ -229,7 +223,11 @@ else:
             st.info(f"Enter the OTP sent to {st.session_state.reset_email}")
             otp_input = st.text_input("OTP Code (for password reset)")
             if st.button("Verify OTP"):
-                ok, msg = verify_user_otp(st.session_state.reset_email, otp_input)
+                allowed, retry_after = rate_limit.allow("otp_verify", st.session_state.reset_email)
+                if allowed:
+                    ok, msg = verify_user_otp(st.session_state.reset_email, otp_input, "reset")
+                else:
+                    ok, msg = False, rate_limit.retry_message(retry_after)
                 if ok:
                     st.session_state.reset_verified = True
                     st.info("OTP verified. You can set a new password.")
@@ -243,6 +241,9 @@ else:
                     st.error("Passwords do not match.")
                 else:
                     update_password(st.session_state.reset_email, new_password)
+                    sessions.revoke_user(st.session_state.reset_email)
                     st.success("Password reset! You can now log in.")
                     st.session_state.reset_email = ""
                     st.session_state.reset_verified = False
+
+metrics.end_rerun()
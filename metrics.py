@@ -0,0 +1,270 @@
+import functools
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+
+# Set ECOFINDS_METRICS=0 to turn every timer into a plain function call
+ENABLED = os.getenv("ECOFINDS_METRICS", "1") != "0"
+EXPORT_PORT = os.getenv("ECOFINDS_METRICS_PORT")          # serve /metrics (Prometheus text) on this port
+EXPORT_FILE = os.getenv("ECOFINDS_METRICS_FILE")          # or rewrite this file every EXPORT_INTERVAL_SECONDS
+EXPORT_INTERVAL_SECONDS = 15
+ADMIN_EMAILS = {e.strip().lower() for e in os.getenv("ECOFINDS_ADMIN_EMAILS", "").split(",") if e.strip()}
+
+SAMPLE_SIZE = 2048      # latest durations kept per timer for the percentiles
+RECENT_RERUNS = 50
+QUANTILES = (0.5, 0.95, 0.99)
+
+_lock = threading.Lock()
+_timers = {}            # name -> {"count", "sum", "samples": deque of seconds}
+_counters = {}          # name -> int
+_caches = {}            # name -> TTLCache, read at export time
+_recent = deque(maxlen=RECENT_RERUNS)
+_local = threading.local()
+_exporter_started = False
+
+# ------------------ Recording ------------------
+
+def observe(name, seconds):
+    with _lock:
+        timer = _timers.get(name)
+        if timer is None:
+            timer = _timers[name] = {"count": 0, "sum": 0.0, "samples": deque(maxlen=SAMPLE_SIZE)}
+        timer["count"] += 1
+        timer["sum"] += seconds
+        timer["samples"].append(seconds)
+    rerun = getattr(_local, "rerun", None)
+    if rerun is not None and not rerun["done"]:
+        span = rerun["spans"].setdefault(name, [0, 0.0])
+        span[0] += 1
+        span[1] += seconds
+
+def incr(name, amount=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+def _count_db_call():
+    rerun = getattr(_local, "rerun", None)
+    if rerun is not None and not rerun["done"]:
+        rerun["db_calls"] += 1
+
+def timed(name):
+    """Decorator recording each call's duration under name (also as a span of the current rerun).
+
+    A db.* call made while another db.* call is running on the thread still
+    gets its span, but only the outermost one counts towards the rerun's db_calls.
+    """
+    def decorate(func):
+        if not ENABLED:
+            return func
+        is_db = name.startswith("db.")
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            outermost = is_db and not getattr(_local, "in_db_call", False)
+            if outermost:
+                _local.in_db_call = True
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - start)
+                if outermost:
+                    _local.in_db_call = False
+                    _count_db_call()
+        return wrapper
+    return decorate
+
+@contextmanager
+def timer(name):
+    """Context manager form of timed(), for blocks that aren't a whole function."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if ENABLED:
+            observe(name, time.perf_counter() - start)
+
+def watch_cache(name, cache):
+    """Export a TTLCache's size and hit ratio."""
+    _caches[name] = cache
+
+# ------------------ Reruns ------------------
+
+def _finish_rerun(rerun):
+    if rerun["done"]:
+        return
+    rerun["done"] = True
+    seconds = time.perf_counter() - rerun["start"]
+    observe(f"rerun.{rerun['script']}", seconds)
+    incr(f"rerun.{rerun['script']}.db_calls", rerun["db_calls"])
+    _recent.append({
+        "script": rerun["script"],
+        "at": rerun["at"],
+        "seconds": seconds,
+        "db_calls": rerun["db_calls"],
+        "spans": {name: tuple(span) for name, span in rerun["spans"].items()},
+    })
+
+class _RerunHandle:
+    """Lives in the script thread's locals; finishes the rerun when the thread exits."""
+
+    def __init__(self, rerun):
+        self.rerun = rerun
+        self.finalizer = weakref.finalize(self, _finish_rerun, rerun)
+
+def begin_rerun(script):
+    """Start collecting spans for one script run on this thread.
+
+    Call at the top of a Streamlit entry point. The run ends at end_rerun(),
+    at the next begin_rerun() on the same thread (st.rerun()), or when the
+    script thread exits (st.stop() or an exception), whichever comes first.
+    """
+    if not ENABLED:
+        return
+    start_exporter()
+    end_rerun()
+    rerun = {"script": script, "at": time.time(), "start": time.perf_counter(), "spans": {}, "db_calls": 0,
+             "done": False}
+    _local.handle = _RerunHandle(rerun)
+    _local.rerun = rerun
+
+def end_rerun():
+    handle = getattr(_local, "handle", None)
+    if handle is not None:
+        _local.handle = _local.rerun = None
+        _finish_rerun(handle.rerun)
+
+# ------------------ Reading ------------------
+
+def quantile(sorted_samples, q):
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, int(q * len(sorted_samples)))
+    return sorted_samples[index]
+
+def snapshot():
+    """Return {"timers": {name: {count, sum, p50, p95, p99}}, "counters", "caches", "reruns"}."""
+    with _lock:
+        timers = {name: (t["count"], t["sum"], sorted(t["samples"])) for name, t in _timers.items()}
+        counters = dict(_counters)
+        reruns = list(_recent)
+    result = {"timers": {}, "counters": counters, "caches": {}, "reruns": reruns}
+    for name, (count, total, samples) in sorted(timers.items()):
+        stats = {"count": count, "sum": total}
+        for q in QUANTILES:
+            stats[f"p{int(q * 100)}"] = quantile(samples, q)
+        result["timers"][name] = stats
+    for name, cache in sorted(_caches.items()):
+        result["caches"][name] = cache.stats()
+    return result
+
+def reset():
+    global _timers, _counters
+    with _lock:
+        _timers, _counters = {}, {}
+        _recent.clear()
+
+# ------------------ Export ------------------
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+def render_prometheus():
+    """The current metrics in the Prometheus text exposition format."""
+    data = snapshot()
+    lines = ["# TYPE ecofinds_span_seconds summary"]
+    for name, stats in data["timers"].items():
+        for q in QUANTILES:
+            lines.append(f'ecofinds_span_seconds{{name="{_label(name)}",quantile="{q}"}} '
+                         f'{stats[f"p{int(q * 100)}"]:.6f}')
+        lines.append(f'ecofinds_span_seconds_sum{{name="{_label(name)}"}} {stats["sum"]:.6f}')
+        lines.append(f'ecofinds_span_seconds_count{{name="{_label(name)}"}} {stats["count"]}')
+    lines.append("# TYPE ecofinds_events_total counter")
+    for name, value in sorted(data["counters"].items()):
+        lines.append(f'ecofinds_events_total{{name="{_label(name)}"}} {value}')
+    lines.append("# TYPE ecofinds_cache_hit_ratio gauge")
+    for name, stats in data["caches"].items():
+        lines.append(f'ecofinds_cache_hit_ratio{{cache="{_label(name)}"}} {stats["hit_rate"]:.4f}')
+    lines.append("# TYPE ecofinds_cache_entries gauge")
+    for name, stats in data["caches"].items():
+        lines.append(f'ecofinds_cache_entries{{cache="{_label(name)}"}} {stats["size"]}')
+    return "\n".join(lines) + "\n"
+
+def write_file(path):
+    # Written aside and renamed, so a scraper never reads half a file
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(tmp, path)
+
+def _serve(port):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+def _write_loop(path):
+    while True:
+        try:
+            write_file(path)
+        except OSError as e:
+            print(f"metrics: could not write {path}: {e}")
+        time.sleep(EXPORT_INTERVAL_SECONDS)
+
+def start_exporter():
+    """Start the configured exporters once per process (no-op when none are set)."""
+    global _exporter_started
+    with _lock:
+        if _exporter_started:
+            return
+        _exporter_started = True
+    if EXPORT_PORT:
+        threading.Thread(target=_serve, args=(int(EXPORT_PORT),), name="metrics-http", daemon=True).start()
+    if EXPORT_FILE:
+        threading.Thread(target=_write_loop, args=(EXPORT_FILE,), name="metrics-file", daemon=True).start()
+
+# ------------------ Streamlit ------------------
+
+def is_admin(email):
+    return (email or "").strip().lower() in ADMIN_EMAILS
+
+def render_panel():
+    """Latency percentiles, cache hit ratios and the latest reruns, for an admin expander."""
+    import streamlit as st
+
+    data = snapshot()
+    st.markdown("**Latency (ms)**")
+    st.dataframe([
+        {"span": name, "calls": s["count"], "p50": s["p50"] * 1000, "p95": s["p95"] * 1000,
+         "p99": s["p99"] * 1000, "total s": s["sum"]}
+        for name, s in data["timers"].items()
+    ], hide_index=True)
+    if data["caches"]:
+        st.markdown("**Caches**")
+        st.dataframe([
+            {"cache": name, "entries": s["size"], "hits": s["hits"], "misses": s["misses"],
+             "hit ratio": s["hit_rate"]}
+            for name, s in data["caches"].items()
+        ], hide_index=True)
+    if data["reruns"]:
+        st.markdown("**Latest reruns**")
+        st.dataframe([
+            {"script": r["script"], "at": time.strftime("%H:%M:%S", time.localtime(r["at"])),
+             "ms": r["seconds"] * 1000, "db calls": r["db_calls"],
+             "slowest span": max(r["spans"], key=lambda name: r["spans"][name][1], default="")}
+            for r in reversed(data["reruns"])
+        ], hide_index=True)
@@ -0,0 +1,479 @@
+import re
+import threading
+import time
+import db_pool
+
+PRODUCT_DB = "product.db"
+USER_DB = "users.db"
+
+SEARCH_INDEXES = ("products_fts", "products_trigram")
+
+_migrated = set()          # database paths already brought up to date in this process
+_migrated_lock = threading.Lock()
+
+# ------------------ Products schema ------------------
+
+PRODUCTS_DDL = '''
+    CREATE TABLE IF NOT EXISTS products (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        price TEXT,
+        price_minor INTEGER,
+        currency TEXT,
+        location TEXT,
+        category TEXT,
+        description TEXT,
+        image_url TEXT,
+        seller_name TEXT,
+        seller_since TEXT,
+        seller_phone TEXT,
+        seller_email TEXT,
+        seller_photo TEXT
+    )
+'''
+
+# Only the indexed columns: version bumps and seller changes must not re-index the listing
+FTS_UPDATE_TRIGGER = '''CREATE TRIGGER IF NOT EXISTS products_fts_au
+    AFTER UPDATE OF title, category, description ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, title, category, description)
+        VALUES ('delete', old.id, old.title, old.category, old.description);
+        INSERT INTO products_fts(rowid, title, category, description)
+        VALUES (new.id, new.title, new.category, new.description);
+    END'''
+
+SEARCH_INDEX_DDL = (
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        title, category, description,
+        content='products', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )''',
+    '''CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, title, category, description)
+        VALUES (new.id, new.title, new.category, new.description);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, title, category, description)
+        VALUES ('delete', old.id, old.title, old.category, old.description);
+    END''',
+    FTS_UPDATE_TRIGGER,
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS products_trigram USING fts5(
+        title,
+        content='products', content_rowid='id',
+        tokenize='trigram'
+    )''',
+    '''CREATE TRIGGER IF NOT EXISTS products_trigram_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_trigram(rowid, title) VALUES (new.id, new.title);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS products_trigram_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_trigram(products_trigram, rowid, title)
+        VALUES ('delete', old.id, old.title);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS products_trigram_au AFTER UPDATE OF title ON products BEGIN
+        INSERT INTO products_trigram(products_trigram, rowid, title)
+        VALUES ('delete', old.id, old.title);
+        INSERT INTO products_trigram(rowid, title) VALUES (new.id, new.title);
+    END''',
+)
+
+PRODUCT_IMAGES_DDL = '''
+    CREATE TABLE IF NOT EXISTS product_images (
+        product_id INTEGER NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+        kind TEXT NOT NULL,
+        source_url TEXT NOT NULL,
+        width INTEGER,
+        height INTEGER,
+        data BLOB NOT NULL,
+        PRIMARY KEY (product_id, kind)
+    ) WITHOUT ROWID
+'''
+
+# One avatar per seller, shared by all of their listings
+SELLER_IMAGES_DDL = '''
+    CREATE TABLE IF NOT EXISTS seller_images (
+        seller_id INTEGER PRIMARY KEY REFERENCES sellers(id) ON DELETE CASCADE,
+        source_url TEXT NOT NULL,
+        width INTEGER,
+        height INTEGER,
+        data BLOB NOT NULL
+    )
+'''
+
+CATALOG_VERSION_DDL = (
+    '''CREATE TABLE IF NOT EXISTS catalog_meta (
+        key TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    ) WITHOUT ROWID''',
+    "INSERT OR IGNORE INTO catalog_meta (key, value) VALUES ('version', 0)",
+    '''CREATE TRIGGER IF NOT EXISTS catalog_version_ai AFTER INSERT ON products BEGIN
+        UPDATE catalog_meta SET value = value + 1 WHERE key = 'version';
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS catalog_version_ad AFTER DELETE ON products BEGIN
+        UPDATE catalog_meta SET value = value + 1 WHERE key = 'version';
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS catalog_version_au AFTER UPDATE ON products BEGIN
+        UPDATE catalog_meta SET value = value + 1 WHERE key = 'version';
+    END''',
+)
+
+# Each row's version goes up on every update, so per-card caches can key on (id, version)
+ROW_VERSION_TRIGGER = '''
+    CREATE TRIGGER IF NOT EXISTS products_version_au AFTER UPDATE ON products
+    WHEN NEW.version = OLD.version BEGIN
+        UPDATE products SET version = OLD.version + 1 WHERE id = NEW.id;
+    END
+'''
+
+# Indexes behind the hot product queries: facets, filters and price sorting
+PRODUCT_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_products_category ON products(category)",
+    "CREATE INDEX IF NOT EXISTS idx_products_location ON products(location)",
+    "CREATE INDEX IF NOT EXISTS idx_products_price ON products(price_minor)",
+    "CREATE INDEX IF NOT EXISTS idx_products_category_price ON products(category, price_minor)",
+)
+
+SELLERS_DDL = '''
+    CREATE TABLE IF NOT EXISTS sellers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        seller_key TEXT NOT NULL UNIQUE,
+        name TEXT,
+        member_since TEXT,
+        phone TEXT,
+        email TEXT,
+        photo TEXT
+    )
+'''
+
+# ------------------ Frozen helpers ------------------
+
+# Copies of backend_db.parse_price and backend_db.seller_key as of the migrations
+# that use them. A migration must transform old data the same way however the
+# app's helpers change later (and importing backend_db here would be circular),
+# so these are never updated; change the app's versions instead.
+_CURRENCIES = {"₹": "INR", "$": "USD", "€": "EUR", "£": "GBP",
+               "RS": "INR", "INR": "INR", "USD": "USD", "EUR": "EUR", "GBP": "GBP"}
+_CURRENCY = r"[₹$€£]|(?<![A-Z])(?:RS|INR|USD|EUR|GBP)(?![A-Z])\.?"
+_PRICE_PATTERN = re.compile(
+    rf"(?:(?P<before>{_CURRENCY})\s*)?(?P<amount>\d[\d,]*(?:\.\d+)?)(?:\s*(?P<after>{_CURRENCY}))?",
+    re.IGNORECASE,
+)
+
+def _parse_price(text):
+    """(minor_units, currency) for a display price like "₹45,000", or (None, None)."""
+    match = _PRICE_PATTERN.search(str(text or "").strip())
+    if not match:
+        return None, None
+    minor = int(round(float(match.group("amount").replace(",", "")) * 100))
+    tokens = [token for token in (match.group("before"), match.group("after")) if token]
+    tokens.sort(key=lambda token: token[0].isalpha())   # symbols before codes
+    currency = _CURRENCIES[tokens[0].rstrip(".").upper()] if tokens else "INR"
+    return minor, currency
+
+def _seller_key(name, phone, email):
+    email = (email or "").strip().lower()
+    if email:
+        return f"email:{email}"
+    name = (name or "").strip().lower()
+    phone = (phone or "").strip()
+    if name or phone:
+        return f"name:{name}|{phone}"
+    return None
+
+# ------------------ Products migrations ------------------
+
+SELLER_COLUMNS = ("seller_name", "seller_since", "seller_phone", "seller_email", "seller_photo")
+
+def table_columns(cursor, table):
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cursor.fetchall()}
+
+def create_products(cursor):
+    cursor.execute(PRODUCTS_DDL)
+
+def add_price_columns(cursor):
+    """Numeric price columns for databases created before they existed, parsed from the display string."""
+    columns = table_columns(cursor, "products")
+    if "price_minor" not in columns:
+        cursor.execute("ALTER TABLE products ADD COLUMN price_minor INTEGER")
+    if "currency" not in columns:
+        cursor.execute("ALTER TABLE products ADD COLUMN currency TEXT")
+
+    cursor.execute("SELECT id, price FROM products WHERE price_minor IS NULL AND price IS NOT NULL")
+    updates = []
+    for product_id, price in cursor.fetchall():
+        minor, currency = _parse_price(price)
+        if minor is not None:
+            updates.append((minor, currency, product_id))
+    cursor.executemany("UPDATE products SET price_minor = ?, currency = ? WHERE id = ?", updates)
+
+def create_search_index(cursor):
+    """FTS5 word/prefix index and title trigram index, kept in sync by triggers."""
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE name IN ('products_fts', 'products_trigram')"
+    )
+    existing = {row[0] for row in cursor.fetchall()}
+
+    for statement in SEARCH_INDEX_DDL:
+        cursor.execute(statement)
+
+    # Rows written before an index existed need indexing once
+    for table in SEARCH_INDEXES:
+        if table not in existing:
+            cursor.execute(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+
+def create_product_images(cursor):
+    cursor.execute(PRODUCT_IMAGES_DDL)
+
+def create_catalog_version(cursor):
+    """A counter bumped by triggers on every products change, so caches in any process can tell they're stale."""
+    for statement in CATALOG_VERSION_DDL:
+        cursor.execute(statement)
+
+def create_product_indexes(cursor):
+    for statement in PRODUCT_INDEXES:
+        cursor.execute(statement)
+
+def create_sellers(cursor):
+    """Move the per-listing seller_* columns into a deduplicated sellers table referenced by seller_id."""
+    cursor.execute(SELLERS_DDL)
+    columns = table_columns(cursor, "products")
+    if "seller_id" not in columns:
+        cursor.execute("ALTER TABLE products ADD COLUMN seller_id INTEGER REFERENCES sellers(id)")
+
+    if "seller_name" in columns:
+        cursor.execute(f"SELECT id, {', '.join(SELLER_COLUMNS)} FROM products ORDER BY id")
+        sellers = {}
+        links = []
+        for product_id, name, since, phone, email, photo in cursor.fetchall():
+            key = _seller_key(name, phone, email)
+            if key is None:
+                continue
+            # The newest listing carries the seller's most recent details
+            sellers[key] = (key, name, since, phone, email, photo)
+            links.append((key, product_id))
+        cursor.executemany('''
+            INSERT OR IGNORE INTO sellers (seller_key, name, member_since, phone, email, photo)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', sellers.values())
+        cursor.executemany(
+            "UPDATE products SET seller_id = (SELECT id FROM sellers WHERE seller_key = ?) WHERE id = ?", links
+        )
+        for column in SELLER_COLUMNS:
+            cursor.execute(f"ALTER TABLE products DROP COLUMN {column}")
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_seller ON products(seller_id)")
+
+def add_row_versions(cursor):
+    if "version" not in table_columns(cursor, "products"):
+        cursor.execute("ALTER TABLE products ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+    cursor.execute(ROW_VERSION_TRIGGER)
+
+def create_seller_images(cursor):
+    """Move seller avatars out of product_images (one copy per listing) into one row per seller."""
+    cursor.execute(SELLER_IMAGES_DDL)
+    cursor.execute('''
+        INSERT OR IGNORE INTO seller_images (seller_id, source_url, width, height, data)
+        SELECT p.seller_id, i.source_url, i.width, i.height, i.data
+        FROM product_images i JOIN products p ON p.id = i.product_id
+        WHERE i.kind = 'seller' AND p.seller_id IS NOT NULL
+    ''')
+    cursor.execute("DELETE FROM product_images WHERE kind = 'seller'")
+
+def narrow_fts_update_trigger(cursor):
+    """Replace the products_fts update trigger that fired on every column (IF NOT EXISTS can't)."""
+    cursor.execute("DROP TRIGGER IF EXISTS products_fts_au")
+    cursor.execute(FTS_UPDATE_TRIGGER)
+
+# ------------------ Users schema ------------------
+
+# One users table for every login flow: email accounts (front.py, integrated.py)
+# and username accounts (back_login.py)
+USERS_DDL = '''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT,
+        email TEXT UNIQUE,
+        password_hash TEXT,
+        is_verified INTEGER NOT NULL DEFAULT 0,
+        otp_code TEXT,
+        otp_expiry INTEGER,
+        username TEXT,
+        dob TEXT,
+        created_at INTEGER
+    )
+'''
+
+def create_users(cursor):
+    """Create the consolidated users table, converting either legacy shape in place."""
+    columns = table_columns(cursor, "users")
+    if not columns:
+        cursor.execute(USERS_DDL)
+    elif "password" in columns and "password_hash" not in columns:
+        # back_login.py shape: (id, username, password)
+        cursor.execute("ALTER TABLE users RENAME TO users_legacy")
+        cursor.execute(USERS_DDL)
+        cursor.execute('''
+            INSERT INTO users (id, username, password_hash, is_verified)
+            SELECT id, username, password, 1 FROM users_legacy
+        ''')
+        cursor.execute("DROP TABLE users_legacy")
+    else:
+        # integrated.py shape: add the columns the other flows need
+        for column, ddl in (("username", "username TEXT"), ("dob", "dob TEXT"), ("created_at", "created_at INTEGER")):
+            if column not in columns:
+                cursor.execute(f"ALTER TABLE users ADD COLUMN {ddl}")
+
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_users_username ON users(username)")
+
+def create_outbox(cursor):
+    """Persistent queue of outbound emails/SMS delivered by the outbox worker."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            channel TEXT NOT NULL,
+            recipient TEXT NOT NULL,
+            template TEXT NOT NULL,
+            params TEXT NOT NULL,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            last_error TEXT,
+            created_at REAL NOT NULL,
+            sent_at REAL
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(status, next_attempt_at)")
+
+def create_otps(cursor):
+    """One-time codes keyed by (email, purpose), replacing the otp_code/otp_expiry user columns."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS otps (
+            email TEXT NOT NULL,
+            purpose TEXT NOT NULL,
+            code_hash TEXT NOT NULL,
+            salt BLOB NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            expires_at REAL NOT NULL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (email, purpose)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_otps_expires ON otps(expires_at)")
+
+    columns = table_columns(cursor, "users")
+    for column in ("otp_code", "otp_expiry"):
+        if column in columns:
+            cursor.execute(f"ALTER TABLE users DROP COLUMN {column}")
+
+def create_rate_limits(cursor):
+    """Token buckets for the rate limiter, shared by every worker process."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rate_limits (
+            key TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_rate_limits_updated ON rate_limits(updated_at)")
+
+def create_sessions(cursor):
+    """Server-side login sessions, looked up by the hash of an opaque token."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sessions (
+            token_hash TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            email TEXT,
+            name TEXT,
+            created_at REAL NOT NULL,
+            last_seen REAL NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_last_seen ON sessions(last_seen)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_email ON sessions(email)")
+
+def add_outbox_owner(cursor):
+    """Which process holds a message's secret params in memory (NULL when it has none)."""
+    if "owner" not in table_columns(cursor, "outbox"):
+        cursor.execute("ALTER TABLE outbox ADD COLUMN owner TEXT")
+
+# ------------------ Registry ------------------
+
+# (version, description, step) per database; append new steps, never edit applied ones
+PRODUCT_MIGRATIONS = (
+    (1, "products table", create_products),
+    (2, "numeric price columns", add_price_columns),
+    (3, "full-text and trigram search indexes", create_search_index),
+    (4, "precomputed image renditions", create_product_images),
+    (5, "catalogue version counter", create_catalog_version),
+    (6, "indexes for facet and price queries", create_product_indexes),
+    (7, "sellers table", create_sellers),
+    (8, "per-row versions", add_row_versions),
+    (9, "search index update trigger on indexed columns only", narrow_fts_update_trigger),
+    (10, "seller avatars keyed by seller", create_seller_images),
+)
+
+USER_MIGRATIONS = (
+    (1, "consolidated users table", create_users),
+    (2, "outbound message queue", create_outbox),
+    (3, "one-time code store", create_otps),
+    (4, "rate limit buckets", create_rate_limits),
+    (5, "login sessions", create_sessions),
+    (6, "outbox secret owner", add_outbox_owner),
+)
+
+def schema_version(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute("SELECT MAX(version) FROM schema_version")
+    return cursor.fetchone()[0] or 0
+
+def migrate(path, migrations):
+    """Apply pending migrations to the database at path in one transaction. Returns the versions applied."""
+    applied = []
+    with db_pool.transaction(path) as conn:
+        cursor = conn.cursor()
+        current = schema_version(cursor)
+        for version, description, step in migrations:
+            if version <= current:
+                continue
+            step(cursor)
+            cursor.execute(
+                "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                (version, description, int(time.time())),
+            )
+            applied.append(version)
+    return applied
+
+def ensure(path, migrations):
+    """Migrate path once per process; later calls return immediately."""
+    if path in _migrated:
+        return
+    with _migrated_lock:
+        if path not in _migrated:
+            migrate(path, migrations)
+            _migrated.add(path)
+
+def ensure_product_schema(path=PRODUCT_DB):
+    ensure(path, PRODUCT_MIGRATIONS)
+
+def ensure_user_schema(path=USER_DB):
+    ensure(path, USER_MIGRATIONS)
+
+# ------------------ CLI ------------------
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Apply EcoFinds schema migrations")
+    parser.add_argument("--products", default=PRODUCT_DB, help="path to product.db")
+    parser.add_argument("--users", default=USER_DB, help="path to users.db")
+    args = parser.parse_args()
+
+    for path, migrations in ((args.products, PRODUCT_MIGRATIONS), (args.users, USER_MIGRATIONS)):
+        applied = migrate(path, migrations)
+        print(f"{path}: " + (f"applied {applied}" if applied else "up to date"))
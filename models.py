@@ -0,0 +1,91 @@
+from collections import namedtuple
+
+# ------------------ Records ------------------
+
+class Record:
+    """Mixin for compact query rows.
+
+    Each projection is a namedtuple subclass with empty __slots__: no per-row
+    __dict__, immutable (safe to share through the in-process caches), and
+    still indexable by column name like sqlite3.Row, so row["title"] keeps working.
+    """
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return getattr(self, key)
+        return super().__getitem__(key)
+
+    def keys(self):
+        return list(self._fields)
+
+    @classmethod
+    def from_cursor(cls, cursor, row):
+        # sqlite3 row_factory signature
+        return cls._make(row)
+
+# Each projection lists (field, SQL expression) against products p LEFT JOIN sellers s
+
+CARD_FIELDS = (
+    ("id", "p.id"), ("title", "p.title"), ("price", "p.price"), ("price_minor", "p.price_minor"),
+    ("currency", "p.currency"), ("location", "p.location"), ("category", "p.category"),
+    ("description", "p.description"), ("image_url", "p.image_url"), ("seller_id", "p.seller_id"),
+    ("version", "p.version"),
+)
+
+DETAIL_FIELDS = CARD_FIELDS + (
+    ("seller_name", "s.name"), ("seller_since", "s.member_since"), ("seller_phone", "s.phone"),
+    ("seller_email", "s.email"), ("seller_photo", "s.photo"),
+)
+
+FACET_FIELDS = (
+    ("id", "p.id"), ("category", "p.category"), ("location", "p.location"), ("price_minor", "p.price_minor"),
+    ("currency", "p.currency"),
+)
+
+class ProductCard(Record, namedtuple("ProductCard", [name for name, _ in CARD_FIELDS])):
+    """What a grid card renders: no seller details."""
+    __slots__ = ()
+    SELECT = ", ".join(sql for _, sql in CARD_FIELDS)
+    FROM = "products p"
+
+class ProductDetail(Record, namedtuple("ProductDetail", [name for name, _ in DETAIL_FIELDS])):
+    """A listing with its seller, for the detail page; needs the sellers join."""
+    __slots__ = ()
+    SELECT = ", ".join(f"{sql} AS {name}" for name, sql in DETAIL_FIELDS)
+    FROM = "products p LEFT JOIN sellers s ON s.id = p.seller_id"
+
+class ProductFacet(Record, namedtuple("ProductFacet", [name for name, _ in FACET_FIELDS])):
+    """Just the columns facet counting looks at."""
+    __slots__ = ()
+    SELECT = ", ".join(sql for _, sql in FACET_FIELDS)
+    FROM = "products p"
+
+PROJECTIONS = {"card": ProductCard, "detail": ProductDetail, "facet": ProductFacet}
+
+# ------------------ Queries ------------------
+
+def get_projection(projection):
+    """Accept a projection name ("card", "detail", "facet") or class."""
+    if isinstance(projection, str):
+        try:
+            return PROJECTIONS[projection]
+        except KeyError:
+            raise ValueError(f"Unknown projection: {projection}") from None
+    return projection
+
+def fetch_all(conn, projection, sql, params=()):
+    """Run sql (which must select projection.SELECT, usually FROM projection.FROM) and return records."""
+    cls = get_projection(projection)
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    # Plain tuples out of sqlite3, retyped in C: no Python call per row
+    new = tuple.__new__
+    return [new(cls, row) for row in cursor.execute(sql, params)]
+
+def fetch_one(conn, projection, sql, params=()):
+    cls = get_projection(projection)
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    row = cursor.execute(sql, params).fetchone()
+    return None if row is None else tuple.__new__(cls, row)
@@ -0,0 +1,110 @@
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+import db_pool
+import migrations
+
+DB_PATH = migrations.USER_DB
+
+OTP_TTL_SECONDS = 300        # 5 minutes
+OTP_DIGITS = 6
+MAX_ATTEMPTS = 5             # wrong guesses before the code is burned
+SWEEP_SECONDS = 60           # how often the sweeper clears expired codes
+SWEEP_BATCH = 1000           # rows deleted per statement, so the write lock is held briefly
+
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+# ------------------ Codes ------------------
+
+def normalize_email(email):
+    return (email or "").strip().lower()
+
+def generate_code():
+    return str(secrets.randbelow(10 ** OTP_DIGITS)).zfill(OTP_DIGITS)
+
+def hash_code(code, salt):
+    # Codes are only stored hashed, so a leaked users.db doesn't hand out live codes
+    return hmac.new(salt, code.strip().encode("utf-8"), hashlib.sha256).hexdigest()
+
+# ------------------ Store ------------------
+
+def issue(email, purpose, ttl=OTP_TTL_SECONDS):
+    """Create a fresh code for (email, purpose), replacing any pending one, and return it."""
+    migrations.ensure_user_schema(DB_PATH)
+    code = generate_code()
+    salt = secrets.token_bytes(16)
+    now = time.time()
+    with db_pool.transaction(DB_PATH) as conn:
+        conn.execute('''
+            INSERT INTO otps (email, purpose, code_hash, salt, attempts, expires_at, created_at)
+            VALUES (?, ?, ?, ?, 0, ?, ?)
+            ON CONFLICT (email, purpose) DO UPDATE SET
+                code_hash = excluded.code_hash, salt = excluded.salt, attempts = 0,
+                expires_at = excluded.expires_at, created_at = excluded.created_at
+        ''', (normalize_email(email), purpose, hash_code(code, salt), salt, now + ttl, now))
+    start_sweeper()
+    return code
+
+def verify(email, purpose, code):
+    """Check a code with one primary-key lookup. Returns (ok, reason).
+
+    reason is "verified", "missing", "expired", "locked" (too many wrong
+    guesses) or "invalid". A correct code is consumed; a wrong one counts
+    against MAX_ATTEMPTS.
+    """
+    key = (normalize_email(email), purpose)
+    now = time.time()
+    with db_pool.transaction(DB_PATH) as conn:
+        row = conn.execute(
+            "SELECT code_hash, salt, attempts, expires_at FROM otps WHERE email = ? AND purpose = ?", key
+        ).fetchone()
+        if row is None:
+            return False, "missing"
+        if row["expires_at"] <= now:
+            conn.execute("DELETE FROM otps WHERE email = ? AND purpose = ?", key)
+            return False, "expired"
+        if row["attempts"] >= MAX_ATTEMPTS:
+            return False, "locked"
+        if hmac.compare_digest(hash_code(code or "", row["salt"]), row["code_hash"]):
+            conn.execute("DELETE FROM otps WHERE email = ? AND purpose = ?", key)
+            return True, "verified"
+        conn.execute("UPDATE otps SET attempts = attempts + 1 WHERE email = ? AND purpose = ?", key)
+        return False, "invalid"
+
+# ------------------ Sweeper ------------------
+
+def sweep_expired(now=None):
+    """Delete expired codes via the expiry index, SWEEP_BATCH at a time. Returns rows deleted."""
+    now = time.time() if now is None else now
+    deleted = 0
+    while True:
+        with db_pool.transaction(DB_PATH) as conn:
+            cursor = conn.execute('''
+                DELETE FROM otps WHERE (email, purpose) IN (
+                    SELECT email, purpose FROM otps WHERE expires_at <= ? LIMIT ?
+                )
+            ''', (now, SWEEP_BATCH))
+        deleted += cursor.rowcount
+        if cursor.rowcount < SWEEP_BATCH:
+            return deleted
+
+def _run():
+    while True:
+        time.sleep(SWEEP_SECONDS)
+        try:
+            sweep_expired()
+        except Exception as e:
+            print(f"❌ OTP sweeper error: {e}")
+
+def start_sweeper():
+    """Start this process's background expiry sweeper if it isn't running."""
+    global _sweeper
+    if _sweeper is not None and _sweeper.is_alive():
+        return
+    with _sweeper_lock:
+        if _sweeper is None or not _sweeper.is_alive():
+            _sweeper = threading.Thread(target=_run, name="otp-sweeper", daemon=True)
+            _sweeper.start()
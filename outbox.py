@@ -0,0 +1,200 @@
+import json
+import random
+import secrets
+import threading
+import time
+import db_pool
+import migrations
+
+DB_PATH = migrations.USER_DB
+
+BATCH_SIZE = 50              # messages claimed (and handed to the provider) per round
+POLL_SECONDS = 2.0           # idle wake-up interval; enqueue() wakes the worker immediately
+LEASE_SECONDS = 60           # a claimed message is retried if its worker dies mid-send
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 300.0
+SECRET_TTL_SECONDS = 600     # a message whose secrets died with their process is failed after this
+ORPHAN_SWEEP_SECONDS = 60    # how often the worker looks for such messages
+
+# Secret params (OTP codes) never reach the outbox table: they stay in this process's memory,
+# keyed by message id, until the message is sent or given up on. Rows carrying secrets are
+# owned by this process, and only its worker claims them.
+PROCESS_ID = secrets.token_hex(8)
+_secret_params = {}
+_secret_lock = threading.Lock()
+
+_wakeup = threading.Event()
+_worker = None
+_worker_lock = threading.Lock()
+_provider = None
+
+# ------------------ Queue ------------------
+
+def enqueue(channel, recipient, template, params, secret_params=None):
+    """Queue a message for background delivery and return its id.
+
+    channel is "email" or "sms"; template names a message the provider knows
+    how to render with params plus secret_params. Only params are written to
+    the outbox table; secret_params are held in memory for this process's
+    worker, so if the process exits first the message fails instead of
+    leaking them. The caller returns straight away.
+    """
+    migrations.ensure_user_schema(DB_PATH)
+    now = time.time()
+    owner = PROCESS_ID if secret_params else None
+    with db_pool.transaction(DB_PATH) as conn:
+        cursor = conn.execute('''
+            INSERT INTO outbox (channel, recipient, template, params, status, attempts, next_attempt_at,
+                                created_at, owner)
+            VALUES (?, ?, ?, ?, 'pending', 0, ?, ?, ?)
+        ''', (channel, recipient, template, json.dumps(params), now, now, owner))
+        message_id = cursor.lastrowid
+        if secret_params:
+            # Before commit: the worker can't claim the row until this transaction ends
+            with _secret_lock:
+                _secret_params[message_id] = dict(secret_params)
+    start_worker()
+    _wakeup.set()
+    return message_id
+
+def delivery_status(message_id):
+    """Return {"status", "attempts", "last_error"} for a queued message, or None if unknown.
+
+    status is "pending", "sending", "sent" or "failed" (gave up after MAX_ATTEMPTS).
+    """
+    conn = db_pool.get_connection(DB_PATH)
+    row = conn.execute(
+        "SELECT status, attempts, last_error FROM outbox WHERE id = ?", (message_id,)
+    ).fetchone()
+    return dict(row) if row else None
+
+def claim_batch(limit=BATCH_SIZE):
+    """Atomically take up to limit due messages, leasing them to this worker."""
+    now = time.time()
+    with db_pool.transaction(DB_PATH) as conn:
+        rows = conn.execute('''
+            UPDATE outbox SET status = 'sending', next_attempt_at = ?
+            WHERE id IN (
+                SELECT id FROM outbox
+                WHERE status IN ('pending', 'sending') AND next_attempt_at <= ?
+                  AND (owner IS NULL OR owner = ?)
+                ORDER BY next_attempt_at
+                LIMIT ?
+            )
+            RETURNING id, channel, recipient, template, params, attempts
+        ''', (now + LEASE_SECONDS, now, PROCESS_ID, limit)).fetchall()
+    with _secret_lock:
+        return [dict(row, params={**json.loads(row["params"]), **_secret_params.get(row["id"], {})})
+                for row in rows]
+
+def record_results(messages, results):
+    """Mark sent messages done and schedule retries with exponential backoff for the rest."""
+    now = time.time()
+    sent, retry, failed = [], [], []
+    for message in messages:
+        error = results.get(message["id"], "no result from provider")
+        attempts = message["attempts"] + 1
+        if error is None:
+            sent.append((attempts, now, message["id"]))
+        elif attempts >= MAX_ATTEMPTS:
+            failed.append((attempts, str(error), message["id"]))
+        else:
+            delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempts - 1))
+            delay *= random.uniform(0.8, 1.2)
+            retry.append((attempts, str(error), now + delay, message["id"]))
+
+    with db_pool.transaction(DB_PATH) as conn:
+        conn.executemany('''
+            UPDATE outbox SET status = 'sent', attempts = ?, sent_at = ?, params = '{}', last_error = NULL
+            WHERE id = ?
+        ''', sent)
+        conn.executemany('''
+            UPDATE outbox SET status = 'pending', attempts = ?, last_error = ?, next_attempt_at = ?
+            WHERE id = ?
+        ''', retry)
+        conn.executemany('''
+            UPDATE outbox SET status = 'failed', attempts = ?, last_error = ?, params = '{}'
+            WHERE id = ?
+        ''', failed)
+    with _secret_lock:
+        for row in sent + failed:
+            _secret_params.pop(row[-1], None)
+
+def fail_orphans():
+    """Give up on messages whose secret params were held by a process that has since exited.
+
+    Their owner can't be reached, so they'd otherwise stay pending forever;
+    after SECRET_TTL_SECONDS any code they carried has expired anyway.
+    """
+    with db_pool.transaction(DB_PATH) as conn:
+        cursor = conn.execute('''
+            UPDATE outbox SET status = 'failed', last_error = 'secret params lost with their process'
+            WHERE status IN ('pending', 'sending') AND owner IS NOT NULL AND owner != ? AND created_at < ?
+        ''', (PROCESS_ID, time.time() - SECRET_TTL_SECONDS))
+    return cursor.rowcount
+
+def seconds_until_next_due():
+    """How long until the earliest message this worker may claim (including retries) becomes due."""
+    conn = db_pool.get_connection(DB_PATH)
+    row = conn.execute(
+        "SELECT MIN(next_attempt_at) FROM outbox WHERE status IN ('pending', 'sending')"
+        " AND (owner IS NULL OR owner = ?)", (PROCESS_ID,)
+    ).fetchone()
+    if row[0] is None:
+        return POLL_SECONDS
+    return max(0.0, row[0] - time.time())
+
+# ------------------ Worker ------------------
+
+def process_once(provider=None):
+    """Claim one batch, hand it to the provider and record the outcome. Returns messages handled."""
+    provider = provider or get_provider()
+    messages = claim_batch()
+    if not messages:
+        return 0
+    try:
+        results = provider.send_batch(messages)
+    except Exception as e:
+        results = {message["id"]: e for message in messages}
+    record_results(messages, results)
+    return len(messages)
+
+def _run():
+    next_sweep = 0.0
+    while True:
+        try:
+            if time.monotonic() >= next_sweep:
+                # Another process may exit (or this one may have restarted) at any time
+                fail_orphans()
+                next_sweep = time.monotonic() + ORPHAN_SWEEP_SECONDS
+            handled = process_once()
+            wait = 0 if handled else min(POLL_SECONDS, max(0.05, seconds_until_next_due()))
+        except Exception as e:
+            print(f"❌ Outbox worker error: {e}")
+            wait = POLL_SECONDS
+        if wait:
+            _wakeup.wait(wait)
+            _wakeup.clear()
+
+def start_worker():
+    """Start this process's background delivery thread if it isn't running."""
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name="outbox-worker", daemon=True)
+            _worker.start()
+
+def set_provider(provider):
+    """Use provider (anything with send_batch(messages) -> {id: error or None}) for delivery."""
+    global _provider
+    _provider = provider
+
+def get_provider():
+    global _provider
+    if _provider is None:
+        import emailverification
+        _provider = emailverification.BrevoProvider()
+    return _provider
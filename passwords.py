@@ -0,0 +1,95 @@
+import base64
+import hashlib
+import hmac
+import os
+import re
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+
+# Cost settings; size them with benchmarks/bench_passwords.py
+SCHEME = os.getenv("ECOFINDS_PASSWORD_SCHEME", "scrypt")          # "scrypt" or "pbkdf2_sha256"
+SCRYPT_N = int(os.getenv("ECOFINDS_SCRYPT_N", str(2 ** 14)))       # CPU/memory cost, power of two
+SCRYPT_R = int(os.getenv("ECOFINDS_SCRYPT_R", "8"))
+SCRYPT_P = int(os.getenv("ECOFINDS_SCRYPT_P", "1"))
+PBKDF2_ITERATIONS = int(os.getenv("ECOFINDS_PBKDF2_ITERATIONS", "600000"))
+HASH_WORKERS = int(os.getenv("ECOFINDS_HASH_WORKERS", "4"))       # concurrent hashes per process
+
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+_LEGACY_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="passwords")
+
+# ------------------ Encoding ------------------
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+def _unb64(text):
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+def _scrypt(password, salt, n, r, p):
+    # OpenSSL refuses scrypt unless maxmem covers the 128 * n * r working set
+    return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r * p, dklen=KEY_BYTES)
+
+def _pbkdf2(password, salt, iterations):
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations, dklen=KEY_BYTES)
+
+# ------------------ Hashing ------------------
+
+def _hash(password, scheme, scrypt_n, pbkdf2_iterations):
+    salt = secrets.token_bytes(SALT_BYTES)
+    if scheme == "scrypt":
+        key = _scrypt(password, salt, scrypt_n, SCRYPT_R, SCRYPT_P)
+        return f"scrypt${scrypt_n}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(key)}"
+    if scheme == "pbkdf2_sha256":
+        key = _pbkdf2(password, salt, pbkdf2_iterations)
+        return f"pbkdf2_sha256${pbkdf2_iterations}${_b64(salt)}${_b64(key)}"
+    raise ValueError(f"Unknown password scheme: {scheme}")
+
+def _verify(password, stored):
+    if _LEGACY_SHA256.match(stored):
+        # Unsalted SHA-256 from before this module existed
+        candidate = hashlib.sha256(password.encode("utf-8")).hexdigest()
+        return hmac.compare_digest(candidate, stored)
+
+    parts = stored.split("$")
+    if parts[0] == "scrypt" and len(parts) == 6:
+        n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+        candidate = _scrypt(password, _unb64(parts[4]), n, r, p)
+        return hmac.compare_digest(candidate, _unb64(parts[5]))
+    if parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+        candidate = _pbkdf2(password, _unb64(parts[2]), int(parts[1]))
+        return hmac.compare_digest(candidate, _unb64(parts[3]))
+    return False
+
+@metrics.timed("password.hash")
+def hash_password(password, scheme=None, scrypt_n=None, pbkdf2_iterations=None):
+    """Return a salted, self-describing hash string for password.
+
+    Runs on the bounded hashing pool, so at most HASH_WORKERS expensive hashes
+    execute at once no matter how many sessions log in together.
+    """
+    return _executor.submit(
+        _hash, password, scheme or SCHEME, scrypt_n or SCRYPT_N, pbkdf2_iterations or PBKDF2_ITERATIONS
+    ).result()
+
+@metrics.timed("password.verify")
+def verify_password(password, stored):
+    """Check password against a stored hash. Returns (ok, needs_rehash)."""
+    if not stored:
+        return False, False
+    ok = _executor.submit(_verify, password, stored).result()
+    return ok, ok and needs_rehash(stored)
+
+def needs_rehash(stored):
+    """True when stored was made with a legacy scheme or different cost than the current settings."""
+    parts = stored.split("$")
+    if SCHEME == "scrypt":
+        return not (parts[0] == "scrypt" and len(parts) == 6
+                    and parts[1:4] == [str(SCRYPT_N), str(SCRYPT_R), str(SCRYPT_P)])
+    if SCHEME == "pbkdf2_sha256":
+        return not (parts[0] == "pbkdf2_sha256" and len(parts) == 4 and parts[1] == str(PBKDF2_ITERATIONS))
+    return True
@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+import db_pool
+import migrations
+
+DB_PATH = migrations.USER_DB
+
+# action -> (burst capacity, seconds to refill the whole bucket)
+LIMITS = {
+    "login": (5, 60),
+    "otp_send": (3, 300),
+    "otp_verify": (10, 300),
+    "password_reset": (5, 300),
+}
+
+BACKEND = os.getenv("ECOFINDS_RATE_LIMIT_BACKEND", "sqlite")   # "sqlite" (shared by all workers) or "memory"
+MAX_MEMORY_KEYS = 100000
+PRUNE_EVERY_CALLS = 500
+
+_backend = None
+_backend_lock = threading.Lock()
+
+# ------------------ Token bucket ------------------
+
+def refill(tokens, updated_at, capacity, rate, now):
+    """Tokens in a bucket after refilling at rate per second since updated_at."""
+    return min(capacity, tokens + max(0.0, now - updated_at) * rate)
+
+def take(states, buckets, now):
+    """Decide one request against several buckets at once.
+
+    states maps key -> (tokens, updated_at) for the buckets seen before.
+    Returns (allowed, retry_after, new_states). A request only spends tokens
+    when every bucket has one, so a rejected burst doesn't drain the others.
+    """
+    levels = {}
+    retry_after = 0.0
+    for key, capacity, rate in buckets:
+        tokens, updated_at = states.get(key, (capacity, now))
+        level = refill(tokens, updated_at, capacity, rate, now)
+        levels[key] = level
+        if level < 1:
+            retry_after = max(retry_after, (1 - level) / rate)
+
+    allowed = retry_after == 0
+    new_states = {key: (level - 1 if allowed else level, now) for key, level in levels.items()}
+    return allowed, retry_after, new_states
+
+# ------------------ Backends ------------------
+
+class MemoryBackend:
+    """Buckets in a dict; only limits this process."""
+
+    def __init__(self, max_keys=MAX_MEMORY_KEYS):
+        self.max_keys = max_keys
+        self.states = {}
+        self.lock = threading.Lock()
+
+    def hit(self, buckets, now):
+        with self.lock:
+            allowed, retry_after, new_states = take(self.states, buckets, now)
+            self.states.update(new_states)
+            if len(self.states) > self.max_keys:
+                # Drop the longest-idle buckets; a fresh bucket starts full anyway
+                idle = sorted(self.states, key=lambda key: self.states[key][1])
+                for key in idle[:len(self.states) - self.max_keys]:
+                    del self.states[key]
+        return allowed, retry_after
+
+class SQLiteBackend:
+    """Buckets in the rate_limits table of users.db, shared by every worker process."""
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self.calls = 0
+        migrations.ensure_user_schema(path)
+
+    def hit(self, buckets, now):
+        keys = [key for key, _, _ in buckets]
+        with db_pool.transaction(self.path) as conn:
+            rows = conn.execute(
+                f"SELECT key, tokens, updated_at FROM rate_limits WHERE key IN ({','.join('?' * len(keys))})",
+                keys,
+            ).fetchall()
+            states = {row["key"]: (row["tokens"], row["updated_at"]) for row in rows}
+            allowed, retry_after, new_states = take(states, buckets, now)
+            conn.executemany('''
+                INSERT INTO rate_limits (key, tokens, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at
+            ''', [(key, tokens, updated_at) for key, (tokens, updated_at) in new_states.items()])
+
+        self.calls += 1
+        if self.calls % PRUNE_EVERY_CALLS == 0:
+            self.prune(now)
+        return allowed, retry_after
+
+    def prune(self, now):
+        """Delete buckets idle long enough to have refilled completely."""
+        longest = max(seconds for _, seconds in LIMITS.values())
+        with db_pool.transaction(self.path) as conn:
+            conn.execute("DELETE FROM rate_limits WHERE updated_at < ?", (now - longest,))
+
+def set_backend(backend):
+    """Use backend (MemoryBackend, SQLiteBackend or anything with hit(buckets, now))."""
+    global _backend
+    _backend = backend
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = MemoryBackend() if BACKEND == "memory" else SQLiteBackend()
+    return _backend
+
+# ------------------ Public API ------------------
+
+def current_session_id():
+    """The Streamlit session id of the running script, or None outside Streamlit."""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return None
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else None
+
+def allow(action, email=None, session_id=None):
+    """Spend one request of action for this email and session. Returns (allowed, retry_after_seconds).
+
+    Call it before hashing, DB writes or network I/O so rejected requests stay cheap.
+    session_id defaults to the current Streamlit session.
+    """
+    capacity, per_seconds = LIMITS[action]
+    rate = capacity / per_seconds
+    session_id = session_id or current_session_id()
+
+    buckets = []
+    if email:
+        buckets.append((f"{action}:email:{email.strip().lower()}", capacity, rate))
+    if session_id:
+        buckets.append((f"{action}:session:{session_id}", capacity, rate))
+    if not buckets:
+        return True, 0.0
+    return get_backend().hit(buckets, time.time())
+
+def retry_message(retry_after):
+    return f"Too many attempts. Please try again in {int(retry_after) + 1} seconds."
@@ -0,0 +1,60 @@
+import backend_db as bd
+import metrics
+from cache import TTLCache
+
+# Card fragments (row, grid rendition, prebuilt markup) by (page, product id, row version)
+CARD_CACHE_SIZE = 4096
+CARD_CACHE_TTL_SECONDS = 600
+MISSING_IMAGE_TTL_SECONDS = 30   # renditions are stored just after their row commits
+
+# Query results by (query, catalogue version, arguments)
+RESULT_CACHE_SIZE = 256
+RESULT_CACHE_TTL_SECONDS = 600
+
+# Both are shared by every session in the process; callers must not modify what they get back
+_cards = TTLCache(max_size=CARD_CACHE_SIZE, ttl=CARD_CACHE_TTL_SECONDS)
+_results = TTLCache(max_size=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL_SECONDS)
+metrics.watch_cache("cards", _cards)
+metrics.watch_cache("results", _results)
+
+# ------------------ Queries ------------------
+
+def cached_query(name, func, **kwargs):
+    """func(**kwargs), run once per catalogue version and shared by every session.
+
+    A rerun with unchanged filters and an unchanged catalogue never reaches
+    SQLite; any products change bumps the version and the next call re-queries.
+    """
+    key = (name, bd.get_catalog_version(), tuple(sorted(kwargs.items())))
+    return _results.get_or_load(key, lambda _: func(**kwargs))
+
+# ------------------ Cards ------------------
+
+def get_cards(rows, page, build, kind="grid"):
+    """Return [(row, image bytes or None, build(row)), ...] in row order.
+
+    Cards are keyed by (page, product id, row version): only rows never seen
+    before, or changed since, load their rendition and rebuild their markup.
+    """
+    cards = {}
+    missing = []
+    for row in rows:
+        card = _cards.get((page, row["id"], row["version"]))
+        if card is None:
+            missing.append(row)
+        else:
+            cards[row["id"]] = card
+
+    if missing:
+        images = bd.get_renditions((row["id"] for row in missing), kind)
+        for row in missing:
+            image = images.get(row["id"])
+            card = (row, image, build(row))
+            ttl = None if image else MISSING_IMAGE_TTL_SECONDS
+            _cards.set((page, row["id"], row["version"]), card, ttl)
+            cards[row["id"]] = card
+    return [cards[row["id"]] for row in rows]
+
+def clear():
+    _cards.clear()
+    _results.clear()
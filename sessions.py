@@ -0,0 +1,164 @@
+import hashlib
+import json
+import secrets
+import time
+import db_pool
+import migrations
+import metrics
+from cache import TTLCache
+
+DB_PATH = migrations.USER_DB
+
+IDLE_TIMEOUT_SECONDS = 30 * 60   # a session unused this long is logged out
+TOUCH_INTERVAL_SECONDS = 60      # last_seen is written at most this often per session
+CACHE_SIZE = 10000
+CACHE_TTL_SECONDS = 30           # how long another process's logout can take to be noticed here
+COOKIE_NAME = "ecofinds_session"
+
+# token hash -> {"user_id", "email", "name", "last_seen"}; shared by every Streamlit session in the process
+_cache = TTLCache(max_size=CACHE_SIZE, ttl=CACHE_TTL_SECONDS)
+metrics.watch_cache("sessions", _cache)
+
+# ------------------ Store ------------------
+
+def token_hash(token):
+    # Only hashes are stored, so the sessions table can't be replayed as cookies
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+def create(user):
+    """Start a session for a users row and return its opaque token."""
+    migrations.ensure_user_schema(DB_PATH)
+    token = secrets.token_urlsafe(32)
+    now = time.time()
+    sweep_expired(now)   # logins are rare enough to pay for the cleanup
+    session = {"user_id": user["id"], "email": user["email"], "name": user["name"], "last_seen": now}
+    with db_pool.transaction(DB_PATH) as conn:
+        conn.execute('''
+            INSERT INTO sessions (token_hash, user_id, email, name, created_at, last_seen)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (token_hash(token), user["id"], user["email"], user["name"], now, now))
+    _cache.set(token_hash(token), session)
+    return token
+
+@metrics.timed("db.load_session")
+def _load(key):
+    conn = db_pool.get_connection(DB_PATH)
+    row = conn.execute(
+        "SELECT user_id, email, name, last_seen FROM sessions WHERE token_hash = ?", (key,)
+    ).fetchone()
+    return dict(row) if row else None
+
+@metrics.timed("session.resolve")
+def resolve(token):
+    """Return the session for token, or None if it is unknown or idle-expired.
+
+    Active sessions are served from the in-process cache; the users table is
+    never read, and the sessions table only on a cache miss or once per
+    TOUCH_INTERVAL_SECONDS to record activity.
+    """
+    if not token:
+        return None
+    key = token_hash(token)
+    now = time.time()
+    session = _cache.get_or_load(key, _load)
+    if session is not None and now - session["last_seen"] > IDLE_TIMEOUT_SECONDS:
+        # The cached copy may be stale if another process saw recent activity
+        _cache.invalidate(key)
+        session = _load(key)
+        if session is not None and now - session["last_seen"] > IDLE_TIMEOUT_SECONDS:
+            revoke(token)
+            return None
+    if session is None:
+        return None
+
+    if now - session["last_seen"] > TOUCH_INTERVAL_SECONDS:
+        with db_pool.transaction(DB_PATH) as conn:
+            conn.execute("UPDATE sessions SET last_seen = ? WHERE token_hash = ?", (now, key))
+        session = dict(session, last_seen=now)
+        _cache.set(key, session)
+    return session
+
+def revoke(token):
+    key = token_hash(token)
+    with db_pool.transaction(DB_PATH) as conn:
+        conn.execute("DELETE FROM sessions WHERE token_hash = ?", (key,))
+    _cache.invalidate(key)
+
+def revoke_user(email):
+    """End every session of a user, e.g. after a password reset."""
+    with db_pool.transaction(DB_PATH) as conn:
+        conn.execute("DELETE FROM sessions WHERE email = ?", (email,))
+    # Other processes drop their copies within CACHE_TTL_SECONDS
+    _cache.clear()
+
+def sweep_expired(now=None):
+    """Delete idle sessions through the last_seen index. Returns rows deleted."""
+    now = time.time() if now is None else now
+    with db_pool.transaction(DB_PATH) as conn:
+        cursor = conn.execute("DELETE FROM sessions WHERE last_seen < ?", (now - IDLE_TIMEOUT_SECONDS,))
+    return cursor.rowcount
+
+# ------------------ Streamlit ------------------
+
+def _write_cookie(token):
+    """Set (or, for None, delete) the session cookie from an empty iframe.
+
+    Streamlit can only read cookies, so the browser writes it; st.iframe runs
+    HTML strings same-origin, which lets the script reach the app's document.
+    """
+    import streamlit as st
+
+    if token:
+        value = f"{COOKIE_NAME}={token}; path=/; SameSite=Strict"
+    else:
+        value = f"{COOKIE_NAME}=; path=/; max-age=0; SameSite=Strict"
+    st.iframe(
+        f"<script>window.parent.document.cookie = {json.dumps(value)}"
+        " + (window.parent.location.protocol === 'https:' ? '; Secure' : '');</script>",
+        height="content",
+    )
+
+def login(user):
+    """Log user in for this browser tab.
+
+    The token lives in session_state; the next current_session() copies it
+    into a cookie, so a reload or a reconnect routed to another server
+    process resumes the same login. It never goes into the URL.
+    """
+    import streamlit as st
+
+    token = create(user)
+    st.session_state.session_token = token
+    return token
+
+def current_session():
+    """The logged-in session for this browser, or None. Call once near the top of every run."""
+    import streamlit as st
+
+    state = st.session_state
+    if "session_cookie" not in state:
+        # First run of this tab: resume whatever login the browser's cookie carries
+        cookie = st.context.cookies.get(COOKIE_NAME)
+        state.session_cookie = cookie if isinstance(cookie, str) else None   # no browser under AppTest
+        if state.session_cookie and not state.get("session_token"):
+            state.session_token = state.session_cookie
+    token = state.get("session_token")
+
+    session = resolve(token)
+    if session is None:
+        token = None
+        state.pop("session_token", None)
+    else:
+        state.session_token = token
+    if state.session_cookie != token:
+        _write_cookie(token)
+        state.session_cookie = token
+    return session
+
+def logout():
+    """End this tab's session; the next current_session() clears the cookie."""
+    import streamlit as st
+
+    token = st.session_state.pop("session_token", None)
+    if token:
+        revoke(token)
@@ -0,0 +1,201 @@
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import metrics
+
+# requests and Pillow are imported on first fetch/render: pages that only read
+# stored renditions (and backend_db, which imports this module) never pay for them
+
+# Sizes the pages render at
+GRID_SIZE = (500, 380)
+DETAIL_SIZE = (1200, 900)
+SELLER_SIZE = (220, 220)
+
+CACHE_DIR = os.getenv("ECOFINDS_THUMB_CACHE", ".thumb_cache")
+CACHE_MAX_BYTES = int(os.getenv("ECOFINDS_THUMB_CACHE_MB", "256")) * 1024 * 1024
+MAX_WORKERS = 8
+FETCH_TIMEOUT = 6
+FAILURE_TTL_SECONDS = 300   # don't re-hit a broken image host on every rerun
+PRUNE_EVERY_WRITES = 50
+JPEG_QUALITY = 85
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="thumbnails")
+_lock = threading.Lock()
+_session = None
+_inflight = {}     # cache key -> Future, so concurrent sessions share one download
+_failures = {}     # cache key -> time of last failed fetch
+_writes_since_prune = 0
+
+# ------------------ HTTP ------------------
+
+def get_session():
+    """Shared HTTP session with a connection pool sized to the worker pool."""
+    global _session
+    with _lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+def configure(cache_dir=None, session=None):
+    """Point the service at another cache directory and/or HTTP session (e.g. a local stand-in)."""
+    global CACHE_DIR, _session
+    with _lock:
+        if cache_dir is not None:
+            CACHE_DIR = cache_dir
+        if session is not None:
+            _session = session
+        _failures.clear()
+
+# ------------------ Disk cache ------------------
+
+def cache_key(url, size):
+    return hashlib.sha256(f"{url}|{size[0]}x{size[1]}".encode("utf-8")).hexdigest()
+
+def cache_path(key):
+    return os.path.join(CACHE_DIR, key[:2], f"{key}.jpg")
+
+def _read_cached(key):
+    path = cache_path(key)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    try:
+        os.utime(path)   # mtime doubles as the LRU clock
+    except OSError:
+        pass
+    return data
+
+def _write_cached(key, data):
+    global _writes_since_prune
+    path = cache_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)   # atomic, so other processes never read half a file
+
+    with _lock:
+        _writes_since_prune += 1
+        should_prune = _writes_since_prune >= PRUNE_EVERY_WRITES
+        if should_prune:
+            _writes_since_prune = 0
+    if should_prune:
+        prune_cache()
+
+def prune_cache(max_bytes=None):
+    """Delete least recently used thumbnails until the cache fits in max_bytes."""
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    total = 0
+    for root, _, files in os.walk(CACHE_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+    return total
+
+# ------------------ Rendering ------------------
+
+@metrics.timed("image.render")
+def render_thumbnail(data, size):
+    """Decode image bytes and return a JPEG that fits inside size."""
+    from PIL import Image
+
+    img = Image.open(BytesIO(data)).convert("RGB")
+    img.thumbnail(size, Image.Resampling.LANCZOS)
+    buf = BytesIO()
+    img.save(buf, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    return buf.getvalue()
+
+@metrics.timed("image.fetch")
+def _fetch_and_store(url, size, key):
+    try:
+        resp = get_session().get(url, timeout=FETCH_TIMEOUT)
+        resp.raise_for_status()
+        data = render_thumbnail(resp.content, size)
+    except Exception:
+        with _lock:
+            _failures[key] = time.time()
+        return None
+    _write_cached(key, data)
+    return data
+
+def _submit(url, size):
+    """Return a Future for the thumbnail, reusing a download already in flight."""
+    key = cache_key(url, size)
+    with _lock:
+        future = _inflight.get(key)
+        if future is not None:
+            return future
+        failed_at = _failures.get(key)
+        if failed_at is not None and time.time() - failed_at < FAILURE_TTL_SECONDS:
+            return None
+        future = _inflight[key] = _executor.submit(_fetch_and_store, url, size, key)
+
+    def _done(_):
+        with _lock:
+            _inflight.pop(key, None)
+    future.add_done_callback(_done)
+    return future
+
+# ------------------ Public API ------------------
+
+def get_thumbnail(url, size=GRID_SIZE):
+    """Return JPEG bytes for url resized to fit size, or None if unavailable."""
+    if not url:
+        return None
+    cached = _read_cached(cache_key(url, size))
+    if cached is not None:
+        return cached
+    future = _submit(url, size)
+    return future.result() if future is not None else None
+
+@metrics.timed("image.get_thumbnails")
+def get_thumbnails(items):
+    """Resolve many (url, size) pairs at once; misses are fetched concurrently.
+
+    Returns a dict keyed by (url, size) with JPEG bytes or None.
+    """
+    results = {}
+    pending = {}
+    for url, size in items:
+        if not url or (url, size) in results:
+            continue
+        cached = _read_cached(cache_key(url, size))
+        if cached is not None:
+            results[(url, size)] = cached
+        else:
+            results[(url, size)] = None
+            future = _submit(url, size)
+            if future is not None:
+                pending[(url, size)] = future
+
+    for item, future in pending.items():
+        results[item] = future.result()
+    return results
@@ -0,0 +1,135 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import db_pool
+import migrations
+import metrics
+
+DB_PATH = migrations.USER_DB
+LEGACY_USER_FILE = "users.json"
+
+_ready = set()
+_ready_lock = threading.Lock()
+
+# ------------------ DB Connection ------------------
+
+def get_db_connection():
+    # Pooled per-thread connection; do not close it. Setup runs on first use.
+    create_user_table()
+    return db_pool.get_connection(DB_PATH)
+
+def transaction():
+    create_user_table()
+    return db_pool.transaction(DB_PATH)
+
+def create_user_table():
+    """Migrate the users schema and import the legacy users.json, once per process."""
+    if DB_PATH in _ready:
+        return
+    with _ready_lock:
+        if DB_PATH not in _ready:
+            migrations.ensure_user_schema(DB_PATH)
+            if os.path.exists(LEGACY_USER_FILE):
+                import_users_json(LEGACY_USER_FILE)
+            _ready.add(DB_PATH)
+
+def normalize_email(email):
+    return (email or "").strip().lower()
+
+# ------------------ Lookups ------------------
+
+@metrics.timed("db.get_user")
+def get_user(email):
+    """Point lookup on the unique email index. Returns a row or None."""
+    conn = get_db_connection()
+    return conn.execute(
+        "SELECT * FROM users WHERE email = ?", (normalize_email(email),)
+    ).fetchone()
+
+@metrics.timed("db.user_exists")
+def user_exists(email):
+    conn = get_db_connection()
+    row = conn.execute(
+        "SELECT EXISTS(SELECT 1 FROM users WHERE email = ?)", (normalize_email(email),)
+    ).fetchone()
+    return bool(row[0])
+
+# ------------------ Writes ------------------
+
+@metrics.timed("db.create_user")
+def create_user(email, name, password_hash, dob=None, verified=False):
+    """Insert a user; returns False if the email is already registered.
+
+    The unique index makes check-and-insert a single atomic statement, so two
+    sessions registering the same email can't both succeed.
+    """
+    try:
+        with transaction() as conn:
+            conn.execute('''
+                INSERT INTO users (email, name, password_hash, dob, is_verified, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (normalize_email(email), name, password_hash, dob, int(verified), int(time.time())))
+        return True
+    except sqlite3.IntegrityError:
+        return False
+
+@metrics.timed("db.update_password")
+def update_password(email, password_hash):
+    """Replace one user's password hash; returns False if the email isn't registered."""
+    with transaction() as conn:
+        cursor = conn.execute(
+            "UPDATE users SET password_hash = ? WHERE email = ?",
+            (password_hash, normalize_email(email)),
+        )
+    return cursor.rowcount > 0
+
+@metrics.timed("db.set_verified")
+def set_verified(email):
+    with transaction() as conn:
+        conn.execute("UPDATE users SET is_verified = 1 WHERE email = ?", (normalize_email(email),))
+
+# ------------------ Import ------------------
+
+def import_users_json(path=LEGACY_USER_FILE):
+    """Copy accounts from the old users.json store. Existing emails are left untouched.
+
+    Returns (imported, skipped).
+    """
+    with open(path, "r") as f:
+        try:
+            users = json.load(f)
+        except ValueError:
+            return 0, 0
+
+    rows = [
+        (normalize_email(email), record.get("name"), record.get("password"),
+         record.get("dob"), int(bool(record.get("verified"))), int(time.time()))
+        for email, record in users.items()
+    ]
+    with db_pool.transaction(DB_PATH) as conn:
+        before = conn.total_changes
+        conn.executemany('''
+            INSERT OR IGNORE INTO users (email, name, password_hash, dob, is_verified, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', rows)
+        imported = conn.total_changes - before
+    return imported, len(rows) - imported
+
+# ------------------ CLI ------------------
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="EcoFinds user database tools")
+    parser.add_argument("command", choices=["import-json"])
+    parser.add_argument("--path", default=LEGACY_USER_FILE, help="users.json to import")
+    parser.add_argument("--db", default=DB_PATH, help="path to users.db")
+    args = parser.parse_args()
+
+    DB_PATH = args.db
+    migrations.ensure_user_schema(DB_PATH)
+    if args.command == "import-json":
+        imported, skipped = import_users_json(args.path)
+        print(f"Imported {imported} users from {args.path} ({skipped} already present)")